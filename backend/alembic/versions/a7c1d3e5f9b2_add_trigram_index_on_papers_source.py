@@ -0,0 +1,37 @@
+"""add trigram index on papers source for substring matching
+
+Revision ID: a7c1d3e5f9b2
+Revises: f6b9c2d4e7a1
+Create Date: 2026-10-16 15:03:12.774126
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a7c1d3e5f9b2'
+down_revision: Union[str, Sequence[str], None] = 'f6b9c2d4e7a1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # 同步脚本按 source LIKE '%xxx%' 选论文，btree 索引无法使用，改用 pg_trgm GIN 索引
+    # 依赖扩展，因此只在迁移中创建，不在模型中声明 (避免 create_all 建库失败)
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    with op.get_context().autocommit_block():
+        op.execute(
+            'CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_papers_source_trgm '
+            'ON papers USING gin (source gin_trgm_ops)'
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # 扩展可能被其他对象使用，回滚时保留
+    with op.get_context().autocommit_block():
+        op.execute('DROP INDEX CONCURRENTLY IF EXISTS ix_papers_source_trgm')
@@ -0,0 +1,29 @@
+"""add pushed_at to paper_embeddings
+
+Revision ID: b8d2e4f6a0c3
+Revises: a7c1d3e5f9b2
+Create Date: 2026-10-16 15:40:51.208337
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b8d2e4f6a0c3'
+down_revision: Union[str, Sequence[str], None] = 'a7c1d3e5f9b2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # 记录 embedding 最近一次推送到云端的时间，同步时跳过未变化的向量
+    op.add_column('paper_embeddings', sa.Column('pushed_at', sa.DateTime(timezone=True), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('paper_embeddings', 'pushed_at')
@@ -0,0 +1,46 @@
+"""add indexes for content anti-join and ranking lookups
+
+Revision ID: c3d9e2a1f7b4
+Revises: 54c12d244a63
+Create Date: 2026-10-16 10:12:03.418215
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c3d9e2a1f7b4'
+down_revision: Union[str, Sequence[str], None] = '54c12d244a63'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # CONCURRENTLY 不能在事务中执行，且不锁表，适合线上大表
+    with op.get_context().autocommit_block():
+        # 内容生成脚本的 NOT EXISTS 反连接依赖 paper_id 索引
+        # 早期迁移已创建同名索引，这里用 IF NOT EXISTS 兜底 create_all 建出的库
+        op.execute(
+            'CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_paper_translations_paper_id '
+            'ON paper_translations (paper_id)'
+        )
+        op.execute(
+            'CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS ix_paper_interpretations_paper_id '
+            'ON paper_interpretations (paper_id)'
+        )
+        # 排序表存在性检查按 (user_id, source_key) 过滤
+        op.execute(
+            'CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_user_ranking_user_source '
+            'ON user_paper_rankings (user_id, source_key)'
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # paper_id 索引归属于早期迁移，这里只回滚新增的组合索引
+    with op.get_context().autocommit_block():
+        op.execute('DROP INDEX CONCURRENTLY IF EXISTS idx_user_ranking_user_source')
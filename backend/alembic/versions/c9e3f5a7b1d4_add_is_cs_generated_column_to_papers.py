@@ -0,0 +1,55 @@
+"""add is_cs generated column and partial indexes to papers
+
+Revision ID: c9e3f5a7b1d4
+Revises: b8d2e4f6a0c3
+Create Date: 2026-10-16 16:17:28.640915
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c9e3f5a7b1d4'
+down_revision: Union[str, Sequence[str], None] = 'b8d2e4f6a0c3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # STORED 生成列，添加时会重写 papers 表
+    op.add_column(
+        'papers',
+        sa.Column(
+            'is_cs',
+            sa.Boolean(),
+            sa.Computed("coalesce(primary_category LIKE 'cs.%', false)", persisted=True),
+        ),
+    )
+    with op.get_context().autocommit_block():
+        # 提交日索引的谓词改为 is_cs，与查询条件保持一致
+        op.execute('DROP INDEX CONCURRENTLY IF EXISTS ix_papers_cs_submitted_day')
+        op.execute(
+            'CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_papers_cs_submitted_day '
+            "ON papers ((date(submitted_date AT TIME ZONE 'UTC'))) WHERE is_cs"
+        )
+        op.execute(
+            'CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_papers_cs_submitted_date '
+            'ON papers (submitted_date DESC) WHERE is_cs'
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.execute('DROP INDEX CONCURRENTLY IF EXISTS ix_papers_cs_submitted_date')
+        op.execute('DROP INDEX CONCURRENTLY IF EXISTS ix_papers_cs_submitted_day')
+        op.execute(
+            'CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_papers_cs_submitted_day '
+            "ON papers ((date(submitted_date AT TIME ZONE 'UTC'))) "
+            "WHERE primary_category LIKE 'cs.%'"
+        )
+    op.drop_column('papers', 'is_cs')
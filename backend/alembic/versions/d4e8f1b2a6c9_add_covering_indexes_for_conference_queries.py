@@ -0,0 +1,46 @@
+"""add covering index for conference source queries
+
+Revision ID: d4e8f1b2a6c9
+Revises: c3d9e2a1f7b4
+Create Date: 2026-10-16 11:02:47.903361
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd4e8f1b2a6c9'
+down_revision: Union[str, Sequence[str], None] = 'c3d9e2a1f7b4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # paper_translations / paper_interpretations 的 paper_id 索引已由 c3d9e2a1f7b4 保证
+    # 排序表按 (source_key, user_id) 的等值查询由 c3d9e2a1f7b4 的 idx_user_ranking_user_source 覆盖
+    with op.get_context().autocommit_block():
+        # 会议论文按 source 取 id，INCLUDE id 后可走仅索引扫描
+        op.create_index(
+            'ix_papers_source_include_id',
+            'papers',
+            ['source'],
+            unique=False,
+            postgresql_include=['id'],
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            'ix_papers_source_include_id',
+            table_name='papers',
+            postgresql_concurrently=True,
+            if_exists=True,
+        )
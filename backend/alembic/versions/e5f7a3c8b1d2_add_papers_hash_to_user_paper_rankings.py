@@ -0,0 +1,29 @@
+"""add papers_hash to user_paper_rankings
+
+Revision ID: e5f7a3c8b1d2
+Revises: d4e8f1b2a6c9
+Create Date: 2026-10-16 11:48:15.220734
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e5f7a3c8b1d2'
+down_revision: Union[str, Sequence[str], None] = 'd4e8f1b2a6c9'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # 已有排序表哈希为空，下次生成推荐池时会被视为过期并重算
+    op.add_column('user_paper_rankings', sa.Column('papers_hash', sa.String(length=32), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('user_paper_rankings', 'papers_hash')
@@ -0,0 +1,36 @@
+"""add partial expression index on cs papers submitted day
+
+Revision ID: f6b9c2d4e7a1
+Revises: e5f7a3c8b1d2
+Create Date: 2026-10-16 14:21:36.552908
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f6b9c2d4e7a1'
+down_revision: Union[str, Sequence[str], None] = 'e5f7a3c8b1d2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # submitted_date 是 timestamptz，date(timestamptz) 依赖会话时区不是 IMMUTABLE，
+    # 因此索引表达式固定按 UTC 取日期，查询端需使用相同表达式
+    with op.get_context().autocommit_block():
+        op.execute(
+            'CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_papers_cs_submitted_day '
+            "ON papers ((date(submitted_date AT TIME ZONE 'UTC'))) "
+            "WHERE primary_category LIKE 'cs.%'"
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.execute('DROP INDEX CONCURRENTLY IF EXISTS ix_papers_cs_submitted_day')
@@ -6,12 +6,14 @@ from typing import AsyncGenerator
 from app.core.config import settings
 
 # 同步引擎（保持向后兼容）
+# 连接池按并发脚本的worker数调优，可通过 SQLA_POOL_SIZE / SQLA_MAX_OVERFLOW / SQLA_POOL_RECYCLE 覆盖
 engine = create_engine(
     settings.database_url, 
     pool_pre_ping=True, 
     future=True,
-    pool_size=20,
-    max_overflow=0
+    pool_size=settings.db_pool_size,
+    max_overflow=settings.db_max_overflow,
+    pool_recycle=settings.db_pool_recycle
 )
 SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False, future=True)
 
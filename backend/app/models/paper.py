@@ -5,7 +5,7 @@ from datetime import datetime, date
 from enum import Enum as PyEnum
 from typing import List, Optional
 
-from sqlalchemy import Boolean, CheckConstraint, Date, DateTime, Enum, Float, ForeignKey, Integer, String, Text, TypeDecorator
+from sqlalchemy import Boolean, CheckConstraint, Computed, Date, DateTime, Enum, Float, ForeignKey, Index, Integer, String, Text, TypeDecorator, text
 from sqlalchemy.dialects.postgresql import ARRAY, JSONB, UUID
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
@@ -49,6 +49,9 @@ class Paper(TimestampMixin, Base):
     comment: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
     doi: Mapped[Optional[str]] = mapped_column(String(256), nullable=True)
     primary_category: Mapped[Optional[str]] = mapped_column(String(128), nullable=True)
+    is_cs: Mapped[bool] = mapped_column(
+        Boolean, Computed("coalesce(primary_category LIKE 'cs.%', false)", persisted=True)
+    )  # 由 primary_category 生成，CS 论文过滤用
     source: Mapped[str] = mapped_column(String(50), nullable=False, default='arxiv', index=True)  # 新增：数据源标识
     ingestion_batch_id: Mapped[uuid.UUID | None] = mapped_column(
         UUID(as_uuid=True), ForeignKey("ingestion_batches.id", ondelete="SET NULL"), nullable=True
@@ -60,6 +63,23 @@ class Paper(TimestampMixin, Base):
     interpretation: Mapped[Optional["PaperInterpretation"]] = relationship(back_populates="paper", uselist=False, cascade="all, delete-orphan")
     infographic: Mapped[Optional["PaperInfographic"]] = relationship(back_populates="paper", uselist=False, cascade="all, delete-orphan")
 
+    __table_args__ = (
+        # 按 source 取论文 id 时走仅索引扫描
+        Index("ix_papers_source_include_id", "source", postgresql_include=["id"]),
+        # 按 UTC 提交日聚合 CS 论文 (表达式需与查询一致)
+        Index(
+            "ix_papers_cs_submitted_day",
+            text("date(submitted_date AT TIME ZONE 'UTC')"),
+            postgresql_where=text("is_cs"),
+        ),
+        # 按提交时间倒序取 CS 论文
+        Index(
+            "ix_papers_cs_submitted_date",
+            text("submitted_date DESC"),
+            postgresql_where=text("is_cs"),
+        ),
+    )
+
 
 class PaperEmbedding(TimestampMixin, Base):
     __tablename__ = "paper_embeddings"
@@ -69,6 +89,7 @@ class PaperEmbedding(TimestampMixin, Base):
     model_name: Mapped[str] = mapped_column(String(256), nullable=False)
     dimension: Mapped[int] = mapped_column(Integer, nullable=False)
     vector: Mapped[List[float]] = mapped_column(ARRAY(Float), nullable=False)
+    pushed_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True), nullable=True)  # 最近一次成功推送到云端的时间
 
     paper: Mapped[Paper] = relationship(back_populates="embeddings")
 
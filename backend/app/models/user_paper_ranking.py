@@ -25,6 +25,8 @@ class UserPaperRanking(Base):
     # 存储排序后的论文ID数组和对应分数数组
     paper_ids: Mapped[list[UUID]] = mapped_column(ARRAY(sa.UUID), nullable=False)
     scores: Mapped[list[float]] = mapped_column(ARRAY(sa.Float), nullable=False)
+    # 生成排序时论文ID集合的哈希，论文集合变化后排序表视为过期
+    papers_hash: Mapped[str | None] = mapped_column(sa.String(32), nullable=True)
     
     created_at: Mapped[pendulum.DateTime] = mapped_column(
         sa.DateTime(timezone=True), 
@@ -41,5 +43,6 @@ class UserPaperRanking(Base):
     # 索引和约束
     __table_args__ = (
         sa.Index("idx_user_ranking_date", "user_id", "pool_date"),
+        sa.Index("idx_user_ranking_user_source", "user_id", "source_key"),
         sa.UniqueConstraint("user_id", "pool_date", "source_key", name="uq_user_ranking_date_source"),
     )
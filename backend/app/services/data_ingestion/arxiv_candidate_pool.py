@@ -4,6 +4,7 @@
 from __future__ import annotations
 
 from datetime import date, datetime, time, timezone
+from functools import lru_cache
 from typing import List
 from uuid import UUID, uuid5, NAMESPACE_DNS
 
@@ -14,8 +15,9 @@ from sqlalchemy.orm import Session
 from app.models import CandidatePool, Paper
 
 
+@lru_cache(maxsize=512)
 def date_to_uuid(target_date: date) -> UUID:
-    """将日期转换为确定性的UUID"""
+    """将日期转换为确定性的UUID (结果确定，按日期缓存)"""
     date_str = target_date.isoformat()
     return uuid5(NAMESPACE_DNS, f"candidate_pool_date_{date_str}")
 
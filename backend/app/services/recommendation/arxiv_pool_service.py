@@ -229,7 +229,7 @@ class ArxivPoolService:
         stmt = select(Paper).where(
             text("(submitted_date AT TIME ZONE 'Asia/Shanghai')::date = :target_date"),
             Paper.source == 'arxiv',
-            Paper.primary_category.like('cs.%')
+            Paper.is_cs
         ).order_by(Paper.submitted_date.desc())
         
         return list(self.session.execute(stmt, {"target_date": target_date}).scalars().all())
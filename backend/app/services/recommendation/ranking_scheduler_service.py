@@ -154,7 +154,7 @@ class RankingSchedulerService:
                 stmt = select(Paper.id).where(
                     cast(Paper.submitted_date, Date) == target_date,
                     Paper.source == 'arxiv',
-                    Paper.primary_category.like('cs.%')
+                    Paper.is_cs
                 )
                 return list(self.session.execute(stmt).scalars().all())
             except (ValueError, IndexError):
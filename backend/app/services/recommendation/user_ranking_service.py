@@ -4,6 +4,8 @@
 """
 from __future__ import annotations
 
+import hashlib
+from collections import defaultdict
 from datetime import date, timedelta
 from typing import List, Optional
 from uuid import UUID
@@ -16,6 +18,12 @@ from app.models import UserPaperRanking, UserFeedback
 from app.services.recommendation.user_paper_ranking import generate_paper_ranking
 
 
+def compute_papers_hash(paper_ids: List[UUID]) -> str:
+    """计算论文ID集合的版本哈希 (与顺序无关)，用于判断排序表是否过期"""
+    id_bytes = sorted(pid.bytes if isinstance(pid, UUID) else UUID(str(pid)).bytes for pid in paper_ids)
+    return hashlib.blake2b(b"".join(id_bytes), digest_size=16).hexdigest()
+
+
 class UserRankingService:
     """用户排序表管理服务"""
     
@@ -32,27 +40,80 @@ class UserRankingService:
     ) -> bool:
         """更新用户排序表"""
         try:
-            # 静态数据源需要预过滤
-            if self._is_static_source(source_key):
-                paper_ids = self._filter_user_feedback_papers(user_id, paper_ids)
-            
-            # 生成排序 (全量打分)
-            scored_papers = generate_paper_ranking(self.session, paper_ids, user_id)
-            if not scored_papers:
+            row = self.build_ranking_row(user_id, source_key, paper_ids, limit=limit)
+            if row is None:
                 return False
             
-            # 截取 Top N
-            if limit and limit > 0:
-                scored_papers = scored_papers[:limit]
-            
             # 保存排序表
-            self._save_ranking(user_id, source_key, scored_papers)
+            self.save_rankings([row])
+            logger.info(f"保存用户 {user_id} 数据源 {row['source_key']} 排序表: {len(row['paper_ids'])} 篇论文")
             return True
             
         except Exception as e:
             logger.error(f"更新排序表失败: {e}")
             return False
     
+    def build_ranking_row(
+        self,
+        user_id: str,
+        source_key: str,
+        paper_ids: List[UUID],
+        limit: Optional[int] = None,
+        papers_hash: Optional[str] = None
+    ) -> Optional[dict]:
+        """计算用户排序表，返回待写入的行数据（不写库），便于调用方批量保存"""
+        # 版本哈希基于数据源的完整论文集合，而非用户过滤后的结果
+        # 批量调用方传入预先算好的哈希，避免每个用户重复排序 + 哈希全部论文ID
+        if papers_hash is None:
+            papers_hash = compute_papers_hash(paper_ids)
+        
+        # 静态数据源需要预过滤
+        if self._is_static_source(source_key):
+            paper_ids = self._filter_user_feedback_papers(user_id, paper_ids)
+        
+        # 生成排序 (全量打分)
+        scored_papers = generate_paper_ranking(self.session, paper_ids, user_id)
+        if not scored_papers:
+            return None
+        
+        # 截取 Top N
+        if limit and limit > 0:
+            scored_papers = scored_papers[:limit]
+        
+        return {
+            'user_id': user_id,
+            'pool_date': date.today(),
+            'source_key': self._resolve_source_key(source_key),
+            'paper_ids': [UUID(sp.paper_id) for sp in scored_papers],
+            'scores': [sp.score for sp in scored_papers],
+            'papers_hash': papers_hash,
+        }
+    
+    def save_rankings(self, rows: List[dict]) -> int:
+        """批量保存排序表：按source_key删除旧排序表，再一次性插入并提交"""
+        if not rows:
+            return 0
+        
+        user_ids_by_source = defaultdict(list)
+        for row in rows:
+            user_ids_by_source[row['source_key']].append(row['user_id'])
+        
+        # 删除相同source_key的旧排序表
+        for source_key, user_ids in user_ids_by_source.items():
+            self.session.execute(
+                delete(UserPaperRanking).where(
+                    and_(
+                        UserPaperRanking.source_key == source_key,
+                        UserPaperRanking.user_id.in_(user_ids)
+                    )
+                )
+            )
+        
+        # 创建新排序表
+        self.session.bulk_insert_mappings(UserPaperRanking, rows)
+        self.session.commit()
+        return len(rows)
+    
     def get_user_ranking(
         self,
         user_id: str,
@@ -127,37 +188,11 @@ class UserRankingService:
         feedback_paper_ids = set(self.session.execute(stmt).scalars().all())
         return [pid for pid in paper_ids if pid not in feedback_paper_ids]
     
-    def _save_ranking(self, user_id: str, source_key: str, scored_papers):
-        """保存排序表到数据库"""
-        # 如果source_key已经包含日期格式，不再添加日期后缀
+    def _resolve_source_key(self, source_key: str) -> str:
+        """动态数据源按天存储，source_key未包含日期时追加当天日期"""
         if self._is_dynamic_source(source_key) and not self._has_date_suffix(source_key):
-            source_key = f"{source_key}_{date.today().strftime('%Y-%m-%d')}"
-        
-        # 删除相同source_key的旧排序表
-        self.session.execute(
-            delete(UserPaperRanking).where(
-                and_(
-                    UserPaperRanking.user_id == user_id,
-                    UserPaperRanking.source_key == source_key
-                )
-            )
-        )
-        
-        # 创建新排序表
-        paper_ids = [UUID(sp.paper_id) for sp in scored_papers]
-        scores = [sp.score for sp in scored_papers]
-        
-        new_ranking = UserPaperRanking(
-            user_id=user_id,
-            pool_date=date.today(),
-            source_key=source_key,
-            paper_ids=paper_ids,
-            scores=scores
-        )
-        
-        self.session.add(new_ranking)
-        self.session.commit()
-        logger.info(f"保存用户 {user_id} 数据源 {source_key} 排序表: {len(paper_ids)} 篇论文")
+            return f"{source_key}_{date.today().strftime('%Y-%m-%d')}"
+        return source_key
     
     def _has_date_suffix(self, source_key: str) -> bool:
         """检查source_key是否已包含日期格式"""
@@ -0,0 +1,136 @@
+"""
+NeurIPS 内容生成脚本的公共组件
+"""
+import os
+from datetime import datetime
+from pathlib import Path
+
+import orjson
+from loguru import logger
+from sqlalchemy import bindparam, text
+
+from app.models import Paper
+
+# 内容生成只用到的Paper列，避免加载其它大字段
+PAPER_GENERATION_COLUMNS = (
+    Paper.id, Paper.title, Paper.summary, Paper.authors, Paper.categories, Paper.arxiv_id
+)
+
+NEURIPS_SOURCE = "conf/neurips2025"
+
+# 候选论文查询在模块级构建一次，复用SQLAlchemy的编译缓存
+# 缺少翻译或AI解读任一项的论文
+PAPERS_MISSING_ANY_CONTENT_SQL = text("""
+    SELECT p.id FROM papers p
+    WHERE p.source = :source
+    AND (
+        NOT EXISTS (
+            SELECT 1 FROM paper_translations pt WHERE pt.paper_id = p.id
+        )
+        OR NOT EXISTS (
+            SELECT 1 FROM paper_interpretations pi WHERE pi.paper_id = p.id
+        )
+    )
+    ORDER BY RANDOM()
+    LIMIT :limit
+""").bindparams(bindparam("source", NEURIPS_SOURCE))
+
+# 翻译和AI解读都没有的论文
+PAPERS_MISSING_ALL_CONTENT_SQL = text("""
+    SELECT p.id FROM papers p
+    WHERE p.source = :source
+    AND NOT EXISTS (
+        SELECT 1 FROM paper_translations pt WHERE pt.paper_id = p.id
+    )
+    AND NOT EXISTS (
+        SELECT 1 FROM paper_interpretations pi WHERE pi.paper_id = p.id
+    )
+    ORDER BY RANDOM()
+    LIMIT :limit
+""").bindparams(bindparam("source", NEURIPS_SOURCE))
+
+# 临时文件目录
+TEMP_DIR = Path(__file__).parent / "temp_results"
+TEMP_DIR.mkdir(exist_ok=True)
+
+def save_single_result_to_temp(paper: Paper, content_type: str, content: any, batch_id: str):
+    """增量保存单个结果到临时文件"""
+    temp_file = TEMP_DIR / f"batch_{batch_id}_{content_type}_{paper.id}.json"
+    
+    result = {
+        "batch_id": batch_id,
+        "timestamp": datetime.now().isoformat(),
+        "paper": {
+            "id": str(paper.id),
+            "arxiv_id": paper.arxiv_id,
+            "title": paper.title
+        },
+        "content_type": content_type,
+        "content": content
+    }
+    
+    with open(temp_file, 'wb') as f:
+        f.write(orjson.dumps(result))
+    
+    logger.debug(f"增量保存: {content_type} - {paper.arxiv_id}")
+    return temp_file
+
+def list_batch_temp_files(batch_id: str) -> list[Path]:
+    """单次扫描临时目录，列出批次的所有临时文件"""
+    prefix = f"batch_{batch_id}_"
+    with os.scandir(TEMP_DIR) as it:
+        return [
+            Path(entry.path) for entry in it
+            if entry.name.startswith(prefix) and entry.name.endswith('.json')
+        ]
+
+def collect_temp_results(batch_id: str) -> dict:
+    """收集所有临时文件的结果"""
+    temp_files = list_batch_temp_files(batch_id)
+    
+    results = {
+        "batch_id": batch_id,
+        "timestamp": datetime.now().isoformat(),
+        "papers": [],
+        "translations": {},
+        "interpretations": {}
+    }
+    
+    papers_seen = set()
+    
+    for temp_file in temp_files:
+        try:
+            with open(temp_file, 'rb') as f:
+                data = orjson.loads(f.read())
+            
+            paper_id = data["paper"]["id"]
+            content_type = data["content_type"]
+            
+            # 添加论文信息（去重）
+            if paper_id not in papers_seen:
+                results["papers"].append(data["paper"])
+                papers_seen.add(paper_id)
+            
+            # 添加内容
+            if content_type == "translation":
+                results["translations"][paper_id] = data["content"]
+            elif content_type == "interpretation":
+                results["interpretations"][paper_id] = data["content"]
+                
+        except Exception as e:
+            logger.warning(f"读取临时文件失败: {temp_file} - {e}")
+    
+    logger.info(f"收集到 {len(temp_files)} 个临时文件的结果")
+    return results
+
+def cleanup_temp_files(batch_id: str):
+    """清理批次的临时文件"""
+    temp_files = list_batch_temp_files(batch_id)
+    
+    for temp_file in temp_files:
+        try:
+            temp_file.unlink()
+        except Exception as e:
+            logger.warning(f"删除临时文件失败: {temp_file} - {e}")
+    
+    logger.info(f"清理了 {len(temp_files)} 个临时文件")
@@ -4,8 +4,6 @@
 使用临时文件缓存策略，避免重复生成成本
 """
 import sys
-import os
-import json
 import random
 from pathlib import Path
 from datetime import datetime
@@ -14,47 +12,31 @@ from datetime import datetime
 backend_path = Path(__file__).resolve().parents[2]
 sys.path.insert(0, str(backend_path))
 
-from sqlalchemy import text
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.orm import Session, load_only
 from loguru import logger
 
 from app.db.session import SessionLocal
 from app.models import Paper, PaperTranslation, PaperInterpretation
 from app.services.content_generation.translation_generate_v2 import generate_translations_for_papers
 from app.services.content_generation.ai_interpretation_generate_v2 import generate_interpretations_for_papers
+from scripts.conf_neurips._common import (
+    PAPER_GENERATION_COLUMNS, PAPERS_MISSING_ALL_CONTENT_SQL,
+    save_single_result_to_temp, collect_temp_results, cleanup_temp_files
+)
 
-# 临时文件目录
-TEMP_DIR = Path(__file__).parent / "temp_results"
-TEMP_DIR.mkdir(exist_ok=True)
 
 def get_papers_without_content(session: Session, limit: int = 10) -> list[Paper]:
     """获取没有翻译和AI解读的neurips2025论文"""
-    query = text("""
-        SELECT p.* FROM papers p
-        WHERE p.source = 'conf/neurips2025'
-        AND NOT EXISTS (
-            SELECT 1 FROM paper_translations pt WHERE pt.paper_id = p.id
-        )
-        AND NOT EXISTS (
-            SELECT 1 FROM paper_interpretations pi WHERE pi.paper_id = p.id
-        )
-        ORDER BY RANDOM()
-        LIMIT :limit
-    """)
+    paper_ids = session.scalars(PAPERS_MISSING_ALL_CONTENT_SQL, {"limit": limit}).all()
+    if not paper_ids:
+        return []
     
-    result = session.execute(query, {"limit": limit})
-    paper_rows = result.fetchall()
-    
-    # 转换为Paper对象并从session中分离，避免多线程session冲突
-    papers = []
-    for row in paper_rows:
-        paper = session.get(Paper, row.id)
-        if paper:
-            # 强制加载所有属性
-            _ = paper.id, paper.title, paper.summary, paper.authors, paper.categories, paper.arxiv_id
-            # 从session中分离对象，避免多线程访问session
-            session.expunge(paper)
-            papers.append(paper)
+    # 一次查询加载所需列，再整体清空identity map，避免多线程访问session
+    papers = session.scalars(
+        select(Paper).options(load_only(*PAPER_GENERATION_COLUMNS)).where(Paper.id.in_(paper_ids))
+    ).all()
+    session.expunge_all()
     
     return papers
 
@@ -80,81 +62,6 @@ def filter_papers_for_generation(session: Session, papers: list[Paper]) -> tuple
     
     return papers_need_translation, papers_need_interpretation
 
-def save_single_result_to_temp(paper: Paper, content_type: str, content: any, batch_id: str):
-    """增量保存单个结果到临时文件"""
-    temp_file = TEMP_DIR / f"batch_{batch_id}_{content_type}_{paper.id}.json"
-    
-    result = {
-        "batch_id": batch_id,
-        "timestamp": datetime.now().isoformat(),
-        "paper": {
-            "id": str(paper.id),
-            "arxiv_id": paper.arxiv_id,
-            "title": paper.title
-        },
-        "content_type": content_type,
-        "content": content
-    }
-    
-    with open(temp_file, 'w', encoding='utf-8') as f:
-        json.dump(result, f, ensure_ascii=False, indent=2)
-    
-    logger.debug(f"增量保存: {content_type} - {paper.arxiv_id}")
-    return temp_file
-
-def collect_temp_results(batch_id: str) -> dict:
-    """收集所有临时文件的结果"""
-    pattern = f"batch_{batch_id}_*.json"
-    temp_files = list(TEMP_DIR.glob(pattern))
-    
-    results = {
-        "batch_id": batch_id,
-        "timestamp": datetime.now().isoformat(),
-        "papers": [],
-        "translations": {},
-        "interpretations": {}
-    }
-    
-    papers_seen = set()
-    
-    for temp_file in temp_files:
-        try:
-            with open(temp_file, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-            
-            paper_id = data["paper"]["id"]
-            content_type = data["content_type"]
-            
-            # 添加论文信息（去重）
-            if paper_id not in papers_seen:
-                results["papers"].append(data["paper"])
-                papers_seen.add(paper_id)
-            
-            # 添加内容
-            if content_type == "translation":
-                results["translations"][paper_id] = data["content"]
-            elif content_type == "interpretation":
-                results["interpretations"][paper_id] = data["content"]
-                
-        except Exception as e:
-            logger.warning(f"读取临时文件失败: {temp_file} - {e}")
-    
-    logger.info(f"收集到 {len(temp_files)} 个临时文件的结果")
-    return results
-
-def cleanup_temp_files(batch_id: str):
-    """清理批次的临时文件"""
-    pattern = f"batch_{batch_id}_*.json"
-    temp_files = list(TEMP_DIR.glob(pattern))
-    
-    for temp_file in temp_files:
-        try:
-            temp_file.unlink()
-        except Exception as e:
-            logger.warning(f"删除临时文件失败: {temp_file} - {e}")
-    
-    logger.info(f"清理了 {len(temp_files)} 个临时文件")
-
 def load_and_save_to_db(results: dict):
     """从收集的结果保存到数据库"""
     logger.info("开始保存到数据库")
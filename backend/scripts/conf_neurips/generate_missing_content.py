@@ -14,13 +14,29 @@ backend_path = Path(__file__).resolve().parents[2]
 sys.path.insert(0, str(backend_path))
 
 from sqlalchemy import text
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, load_only
 from loguru import logger
 
 from app.db.session import SessionLocal
 from app.models import Paper, PaperTranslation, PaperInterpretation
 from app.services.content_generation.translation_generate_v2 import generate_translations_for_papers
 from app.services.content_generation.ai_interpretation_generate_v2 import generate_interpretations_for_papers
+from scripts.conf_neurips._common import PAPER_GENERATION_COLUMNS
+
+# 循环内复用的查询在模块级构建一次，复用SQLAlchemy的编译缓存
+_TRANSLATION_COUNT_SQL = text("""
+    SELECT COUNT(*) FROM paper_translations 
+    WHERE paper_id = :paper_id AND title_zh IS NOT NULL
+""")
+_INTERPRETATION_COUNT_SQL = text("""
+    SELECT COUNT(*) FROM paper_interpretations 
+    WHERE paper_id = :paper_id AND interpretation IS NOT NULL
+""")
+_CONTENT_CHECK_SQL = text("""
+    SELECT 
+        (SELECT COUNT(*) FROM paper_translations pt WHERE pt.paper_id = :paper_id AND pt.title_zh IS NOT NULL) as has_translation,
+        (SELECT COUNT(*) FROM paper_interpretations pi WHERE pi.paper_id = :paper_id AND pi.interpretation IS NOT NULL) as has_interpretation
+""")
 
 # 需要处理的16篇论文ID
 MISSING_PAPERS = [
@@ -48,14 +64,10 @@ def get_papers_needing_translation(session: Session) -> list[Paper]:
     
     for paper_id in MISSING_PAPERS:
         # 检查是否缺少翻译
-        translation_query = text("""
-            SELECT COUNT(*) FROM paper_translations 
-            WHERE paper_id = :paper_id AND title_zh IS NOT NULL
-        """)
-        has_translation = session.execute(translation_query, {"paper_id": paper_id}).scalar() > 0
+        has_translation = session.execute(_TRANSLATION_COUNT_SQL, {"paper_id": paper_id}).scalar() > 0
         
         if not has_translation:
-            paper = session.get(Paper, uuid.UUID(paper_id))
+            paper = session.get(Paper, uuid.UUID(paper_id), options=[load_only(*PAPER_GENERATION_COLUMNS)])
             if paper:
                 papers_needing_translation.append(paper)
     
@@ -67,14 +79,10 @@ def get_papers_needing_interpretation(session: Session) -> list[Paper]:
     
     for paper_id in MISSING_PAPERS:
         # 检查是否缺少AI解读
-        interpretation_query = text("""
-            SELECT COUNT(*) FROM paper_interpretations 
-            WHERE paper_id = :paper_id AND interpretation IS NOT NULL
-        """)
-        has_interpretation = session.execute(interpretation_query, {"paper_id": paper_id}).scalar() > 0
+        has_interpretation = session.execute(_INTERPRETATION_COUNT_SQL, {"paper_id": paper_id}).scalar() > 0
         
         if not has_interpretation:
-            paper = session.get(Paper, uuid.UUID(paper_id))
+            paper = session.get(Paper, uuid.UUID(paper_id), options=[load_only(*PAPER_GENERATION_COLUMNS)])
             if paper:
                 papers_needing_interpretation.append(paper)
     
@@ -162,12 +170,7 @@ def main():
         
         for paper_id in MISSING_PAPERS:
             # 检查是否同时有翻译和解读
-            check_query = text("""
-                SELECT 
-                    (SELECT COUNT(*) FROM paper_translations pt WHERE pt.paper_id = :paper_id AND pt.title_zh IS NOT NULL) as has_translation,
-                    (SELECT COUNT(*) FROM paper_interpretations pi WHERE pi.paper_id = :paper_id AND pi.interpretation IS NOT NULL) as has_interpretation
-            """)
-            result = session.execute(check_query, {"paper_id": paper_id}).fetchone()
+            result = session.execute(_CONTENT_CHECK_SQL, {"paper_id": paper_id}).fetchone()
             
             if result.has_translation > 0 and result.has_interpretation > 0:
                 complete_papers += 1
@@ -12,9 +12,13 @@ NeurIPS 2025 推荐池批量生成脚本
 import sys
 import os
 import asyncio
+import json
 import logging
+import pickle
+import time
+from functools import wraps
 from datetime import datetime, date
-from typing import List, Dict, Set
+from typing import List, Dict, Optional, Set, TextIO
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from uuid import UUID
 
@@ -25,6 +29,7 @@ from sqlalchemy import select, func, distinct
 from sqlalchemy.orm import Session
 
 from app.api.deps import get_db
+from app.core.config import settings
 from app.models import Paper, UserFeedback, UserPaperRanking
 from app.services.recommendation.user_ranking_service import UserRankingService
 from app.services.recommendation.multi_layer_recommendation import MultiLayerRecommendationService
@@ -40,19 +45,55 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+CACHE_DIR = os.path.join(os.path.dirname(__file__), 'temp_results')
+
+
+def disk_cached(ttl: int = 600):
+    """将查询结果缓存到 temp_results/cache_{name}.pkl，按文件修改时间判断过期
+
+    仅在实例的 use_cache 为 True 时生效（开发调试用），正式批量运行不读写缓存。
+    """
+    def decorator(fn):
+        cache_path = os.path.join(CACHE_DIR, f"cache_{fn.__name__}.pkl")
+
+        @wraps(fn)
+        def wrapper(self, *args, **kwargs):
+            if not self.use_cache:
+                return fn(self, *args, **kwargs)
+
+            try:
+                if time.time() - os.path.getmtime(cache_path) < ttl:
+                    with open(cache_path, 'rb') as f:
+                        _, value = pickle.load(f)
+                    logger.info(f"使用缓存结果: {cache_path}")
+                    return value
+            except (OSError, pickle.UnpicklingError, EOFError):
+                pass
+
+            value = fn(self, *args, **kwargs)
+            os.makedirs(CACHE_DIR, exist_ok=True)
+            with open(cache_path, 'wb') as f:
+                pickle.dump((time.time(), value), f)
+            return value
+
+        return wrapper
+    return decorator
+
 
 class NeurIPSPoolGenerator:
     """NeurIPS推荐池生成器"""
     
-    def __init__(self):
+    def __init__(self, use_cache: bool = False):
         self.session = None
         self.ranking_service = None
         self.ml_service = None
+        self.use_cache = use_cache
         
     def setup_session(self):
         """设置数据库会话"""
         db_gen = get_db()
         self.session = next(db_gen)
+        logger.info(f"数据库连接池: pool_size={settings.db_pool_size}, max_overflow={settings.db_max_overflow}")
         self.ranking_service = UserRankingService(self.session)
         self.ml_service = MultiLayerRecommendationService(self.session)
         
@@ -61,6 +102,7 @@ class NeurIPSPoolGenerator:
         if self.session:
             self.session.close()
     
+    @disk_cached(ttl=600)
     def get_active_users(self) -> List[str]:
         """获取活跃用户列表"""
         logger.info("获取活跃用户列表...")
@@ -81,6 +123,7 @@ class NeurIPSPoolGenerator:
         logger.info(f"找到 {len(all_users)} 个活跃用户")
         return list(all_users)
     
+    @disk_cached(ttl=600)
     def get_neurips_papers(self) -> List[UUID]:
         """获取所有neurips2025论文"""
         logger.info("获取neurips2025论文...")
@@ -147,23 +190,26 @@ class NeurIPSPoolGenerator:
         
         return result
     
-    def generate_batch(self, users: List[str], paper_ids: List[UUID], force_update: bool = False) -> Dict:
-        """批量生成推荐池"""
+    def generate_batch(self, users: List[str], paper_ids: List[UUID], force_update: bool = False,
+                       detail_file: Optional[TextIO] = None) -> Dict:
+        """批量生成推荐池，每个用户的结果生成后立即写入 detail_file，不在内存中累积"""
         logger.info(f"开始为 {len(users)} 个用户生成neurips2025排序表...")
         
         results = {
             'total': len(users),
             'success': 0,
             'failed': 0,
-            'skipped': 0,
-            'details': []
+            'skipped': 0
         }
         
+        total = len(users)
         for i, user_id in enumerate(users, 1):
-            logger.info(f"处理用户 {i}/{len(users)}: {user_id}")
+            logger.debug("处理用户 %d/%d: %s", i, total, user_id)
             
             result = self.generate_user_ranking(user_id, paper_ids, force_update)
-            results['details'].append(result)
+            if detail_file is not None:
+                detail_file.write(',\n  ' if i > 1 else '\n  ')
+                detail_file.write(json.dumps(result, ensure_ascii=False))
             
             if result['success']:
                 if 'skipped' in result['message']:
@@ -173,9 +219,12 @@ class NeurIPSPoolGenerator:
             else:
                 results['failed'] += 1
             
-            # 每10个用户输出一次进度
-            if i % 10 == 0:
-                logger.info(f"进度: {i}/{len(users)} - 成功: {results['success']}, 失败: {results['failed']}, 跳过: {results['skipped']}")
+            # 按2的幂次及最后一个用户输出进度，参数交给logging延迟格式化
+            if i & (i - 1) == 0 or i == total:
+                logger.info(
+                    "进度: %d/%d - 成功: %d, 失败: %d, 跳过: %d",
+                    i, total, results['success'], results['failed'], results['skipped']
+                )
         
         return results
     
@@ -205,9 +254,17 @@ class NeurIPSPoolGenerator:
                 users = users[:max_users]
                 logger.info(f"限制处理用户数量为: {max_users}")
             
-            # 批量生成
+            # 批量生成，详细结果边生成边写入文件
             start_time = datetime.now()
-            results = self.generate_batch(users, paper_ids, force_update)
+            result_path = self.result_path(start_time)
+            with open(result_path, 'w', encoding='utf-8') as f:
+                f.write('{"timestamp": ')
+                f.write(json.dumps(start_time.isoformat()))
+                f.write(', "details": [')
+                results = self.generate_batch(users, paper_ids, force_update, detail_file=f)
+                f.write('\n], "summary": ')
+                f.write(json.dumps(results, ensure_ascii=False))
+                f.write('}\n')
             end_time = datetime.now()
             
             # 输出结果
@@ -219,9 +276,7 @@ class NeurIPSPoolGenerator:
             logger.info(f"已存在跳过: {results['skipped']}")
             logger.info(f"耗时: {end_time - start_time}")
             logger.info("=" * 60)
-            
-            # 保存详细结果
-            self.save_results(results, start_time)
+            logger.info(f"详细结果已保存到: {result_path}")
             
         except Exception as e:
             logger.error(f"生成过程出错: {e}")
@@ -229,32 +284,12 @@ class NeurIPSPoolGenerator:
         finally:
             self.cleanup_session()
     
-    def save_results(self, results: Dict, start_time: datetime):
-        """保存结果到文件"""
-        import json
-        
+    def result_path(self, start_time: datetime) -> str:
+        """结果文件路径 (temp_results/neurips_pool_results_时间戳.json)，确保目录存在"""
         result_file = f"neurips_pool_results_{start_time.strftime('%Y%m%d_%H%M%S')}.json"
         result_path = os.path.join(os.path.dirname(__file__), 'temp_results', result_file)
-        
-        # 确保目录存在
         os.makedirs(os.path.dirname(result_path), exist_ok=True)
-        
-        # 转换UUID为字符串以便JSON序列化
-        serializable_results = {
-            'timestamp': start_time.isoformat(),
-            'summary': {
-                'total': results['total'],
-                'success': results['success'],
-                'failed': results['failed'],
-                'skipped': results['skipped']
-            },
-            'details': results['details']
-        }
-        
-        with open(result_path, 'w', encoding='utf-8') as f:
-            json.dump(serializable_results, f, indent=2, ensure_ascii=False)
-        
-        logger.info(f"详细结果已保存到: {result_path}")
+        return result_path
 
 
 def main():
@@ -265,12 +300,16 @@ def main():
     parser.add_argument('--force', action='store_true', help='强制更新已存在的排序表')
     parser.add_argument('--max-users', type=int, help='限制处理的最大用户数（用于测试）')
     parser.add_argument('--dry-run', action='store_true', help='试运行，只显示统计信息')
+    parser.add_argument('--no-cache', action='store_true', help='不使用用户/论文查询的本地缓存')
     
     args = parser.parse_args()
     
+    # 仅在试运行或限量调试时使用本地缓存，--force/--no-cache 时跳过
+    use_cache = (args.dry_run or bool(args.max_users)) and not (args.force or args.no_cache)
+    
     if args.dry_run:
         # 试运行模式
-        generator = NeurIPSPoolGenerator()
+        generator = NeurIPSPoolGenerator(use_cache=use_cache)
         generator.setup_session()
         
         users = generator.get_active_users()
@@ -289,7 +328,7 @@ def main():
         return
     
     # 正式运行
-    generator = NeurIPSPoolGenerator()
+    generator = NeurIPSPoolGenerator(use_cache=use_cache)
     generator.run(force_update=args.force, max_users=args.max_users)
 
 
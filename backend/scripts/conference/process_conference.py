@@ -18,29 +18,149 @@
 
 import sys
 import os
-import json
+import random
 import argparse
 from pathlib import Path
 from datetime import datetime
-from typing import List, Dict, Optional
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import lru_cache, partial
+from itertools import islice
+from typing import List, Dict, Optional, Set
 from uuid import UUID
 
 # 添加backend根目录到路径
 backend_root = Path(__file__).parent.parent.parent
 sys.path.insert(0, str(backend_root))
 
-from sqlalchemy import select, distinct
-from sqlalchemy.orm import Session
+from sqlalchemy import String, cast, exists, func, select, union
+from sqlalchemy.orm import Session, load_only
 from loguru import logger
 
-from app.db.session import SessionLocal
+from app.db.session import SessionLocal, engine
 from app.models import Paper, UserFeedback, UserPaperRanking, PaperTranslation, PaperInterpretation
 from app.services.data_ingestion.conference_import import (
     import_conference_papers,
     get_available_2025_conferences,
     SUPPORTED_2025_CONFERENCES
 )
-from app.services.recommendation.user_ranking_service import UserRankingService
+from app.services.recommendation.user_ranking_service import UserRankingService, compute_papers_hash
+
+# 推荐池生成时每批写入的用户排序表数量
+RANKING_BATCH_SIZE = 500
+
+# 支持的会议ID集合，导入时固化
+_SUPPORTED_IDS = frozenset(SUPPORTED_2025_CONFERENCES)
+
+# 论文数不超过该值时，翻译与解读合并为一次API请求
+COMBINED_GENERATION_MAX_PAPERS = 4
+
+
+# 子进程内的排序参数，由 initializer 每个进程设置一次，任务只传用户ID
+_worker_conference_id: Optional[str] = None
+_worker_paper_ids: tuple[UUID, ...] = ()
+_worker_papers_hash: Optional[str] = None
+
+
+def _init_ranking_worker(conference_id: str, paper_ids: tuple[UUID, ...], papers_hash: str):
+    """排序子进程初始化：丢弃fork继承的连接池，记录排序参数，并启用优化版排序算法"""
+    global _worker_conference_id, _worker_paper_ids, _worker_papers_hash
+    engine.dispose(close=False)
+    _worker_conference_id = conference_id
+    _worker_paper_ids = paper_ids
+    _worker_papers_hash = papers_hash
+    try:
+        from app.services.recommendation.user_paper_ranking_optimized import patch_ranking_service
+        patch_ranking_service()
+    except ImportError:
+        pass
+
+
+def _compute_ranking_row(service: UserRankingService, user_id: str, conference_id: str,
+                         paper_ids: tuple[UUID, ...], papers_hash: str) -> tuple[str, Optional[dict], Optional[str]]:
+    """计算单个用户的排序表行，异常转为错误信息返回"""
+    try:
+        row = service.build_ranking_row(
+            user_id=user_id,
+            source_key=conference_id,
+            paper_ids=paper_ids,
+            papers_hash=papers_hash
+        )
+        return user_id, row, None
+    except Exception as e:
+        service.session.rollback()
+        return user_id, None, str(e)
+
+
+def _build_ranking_row(user_id: str) -> tuple[str, Optional[dict], Optional[str]]:
+    """子进程任务：用独立session计算单个用户的排序表行"""
+    with SessionLocal() as session:
+        return _compute_ranking_row(
+            UserRankingService(session), user_id, _worker_conference_id, _worker_paper_ids, _worker_papers_hash
+        )
+
+
+@lru_cache(maxsize=32)
+def _load_conf_paper_ids(source_key: str, paper_count_hint: int) -> tuple[UUID, ...]:
+    """按 (source_key, 论文数) 缓存会议论文ID，同一进程内重复运行时跳过查询"""
+    # 服务端游标分块拉取，避免驱动一次性缓冲全部行
+    stmt = select(Paper.id).where(Paper.source == source_key).execution_options(
+        stream_results=True, yield_per=5000
+    )
+    with SessionLocal() as session:
+        return tuple(session.scalars(stmt))
+
+
+def _combined_gen(client, paper: Paper) -> Optional[tuple[tuple[str, str], str]]:
+    """一次请求同时生成翻译与AI解读，返回 ((title_zh, summary_zh), interpretation)"""
+    from app.services.content_generation.ai_interpretation_unified import is_interpretation_complete
+    
+    prompt = f"""请完成以下英文学术论文的两项任务。
+
+一、将标题和摘要翻译成中文，保持学术性和专业术语准确。
+二、面向大一学生用800-1200字中文解读论文，分三个部分：研究背景、核心方法、主要贡献。
+
+请严格按以下格式返回：
+标题：[翻译后的标题]
+摘要：[翻译后的摘要]
+## 研究背景
+[内容]
+## 核心方法
+[内容]
+## 主要贡献
+[内容]
+
+Paper Title: {paper.title}
+Categories: {', '.join(paper.categories)}
+Abstract: {paper.summary}"""
+    
+    try:
+        response = client.chat.completions.create(
+            model="deepseek-reasoner",
+            messages=[
+                {"role": "system", "content": "你是专业的学术论文翻译与解读助手。"},
+                {"role": "user", "content": prompt}
+            ],
+            temperature=0.5,
+        )
+        result = response.choices[0].message.content.strip()
+    except Exception as e:
+        logger.error(f"合并生成失败: {paper.title[:50]} - {e}")
+        return None
+    
+    title_zh = summary_zh = ""
+    for line in result.split('\n'):
+        if line.startswith('标题：'):
+            title_zh = line[3:].strip()
+        elif line.startswith('摘要：'):
+            summary_zh = line[3:].strip()
+    
+    section_start = result.find('## ')
+    interpretation = result[section_start:].strip() if section_start >= 0 else ""
+    
+    if not (title_zh and summary_zh and is_interpretation_complete(interpretation)):
+        logger.warning(f"合并生成结果解析失败: {paper.title[:50]}")
+        return None
+    return (title_zh, summary_zh), interpretation
 
 
 class ConferenceProcessor:
@@ -90,42 +210,38 @@ class ConferenceProcessor:
     
     def get_active_users(self) -> List[str]:
         """获取活跃用户列表"""
-        # 从UserFeedback表获取有反馈行为的用户
-        feedback_users = set(self.session.execute(
-            select(distinct(UserFeedback.user_id))
-        ).scalars().all())
-        
-        # 从UserPaperRanking表获取有排序表的用户
-        ranking_users = set(self.session.execute(
-            select(distinct(UserPaperRanking.user_id))
-        ).scalars().all())
-        
-        all_users = feedback_users.union(ranking_users)
+        # 有反馈行为或已有排序表的用户，由数据库 UNION 一次去重
+        stmt = union(
+            select(UserFeedback.user_id),
+            select(UserPaperRanking.user_id)
+        )
+        all_users = self.session.execute(stmt).scalars().all()
         logger.info(f"找到 {len(all_users)} 个活跃用户")
-        return list(all_users)
+        return all_users
     
     def get_conference_papers(self) -> List[UUID]:
         """获取该会议的所有论文ID"""
-        papers = self.session.execute(
-            select(Paper.id).where(
-                Paper.source == self.source_key
-            )
-        ).scalars().all()
+        # 论文数变化即视为缓存失效，count查询代价远低于拉取全部ID
+        paper_count = self.session.scalar(
+            select(func.count()).select_from(Paper).where(Paper.source == self.source_key)
+        )
+        papers = _load_conf_paper_ids(self.source_key, paper_count)
         
         logger.info(f"找到 {len(papers)} 篇 {self.conference_id} 论文")
         return list(papers)
     
-    def check_existing_ranking(self, user_id: str) -> bool:
-        """检查用户是否已有该会议的排序表"""
-        existing = self.session.execute(
-            select(UserPaperRanking.id).where(
-                UserPaperRanking.user_id == user_id,
-                UserPaperRanking.source_key == self.conference_id
+    def _existing_ranking_users(self, user_ids: List[str], papers_hash: str) -> Set[str]:
+        """一次查询出已有该会议最新排序表的用户（论文集合哈希一致才算最新）"""
+        return set(self.session.execute(
+            select(UserPaperRanking.user_id).where(
+                UserPaperRanking.source_key == self.conference_id,
+                UserPaperRanking.user_id.in_(user_ids),
+                UserPaperRanking.papers_hash == papers_hash
             )
-        ).scalar_one_or_none()
-        return existing is not None
+        ).scalars().all())
     
-    def run_pool_generation(self, force_update: bool = False, max_users: int = None) -> Dict:
+    def run_pool_generation(self, force_update: bool = False, max_users: int = None,
+                            workers: int = 1) -> Dict:
         """为所有活跃用户生成推荐池"""
         logger.info(f"开始为 {self.conference_id} 生成推荐池...")
         
@@ -150,30 +266,56 @@ class ConferenceProcessor:
         
         results = {'total': len(users), 'success': 0, 'failed': 0, 'skipped': 0}
         
-        for i, user_id in enumerate(users, 1):
-            try:
-                if not force_update and self.check_existing_ranking(user_id):
-                    results['skipped'] += 1
-                    continue
+        # 论文集合的版本哈希只算一次，跳过检查与每个用户的排序表行共用
+        papers_hash = compute_papers_hash(paper_ids)
+        
+        if not force_update:
+            existing_users = self._existing_ranking_users(users, papers_hash)
+            users = [user_id for user_id in users if user_id not in existing_users]
+            results['skipped'] = results['total'] - len(users)
+        
+        # 各用户排序相互独立，多进程分片计算；每批一次删除 + 批量插入 + 提交
+        # 论文ID经 initializer 每个进程只传一次，任务只序列化用户ID；单进程时复用当前session
+        if workers > 1:
+            executor = ProcessPoolExecutor(
+                max_workers=workers,
+                initializer=_init_ranking_worker,
+                initargs=(self.conference_id, paper_ids, papers_hash)
+            )
+            ranking_map = partial(executor.map, _build_ranking_row, chunksize=8)
+        else:
+            executor = None
+            ranking_map = lambda user_ids: (
+                _compute_ranking_row(self.ranking_service, user_id, self.conference_id, paper_ids, papers_hash)
+                for user_id in user_ids
+            )
+        logger.info(f"排序表计算进程数: {workers if executor else 1}")
+        
+        processed = results['skipped']
+        user_iter = iter(users)
+        try:
+            while batch := list(islice(user_iter, RANKING_BATCH_SIZE)):
+                rows = []
+                for user_id, row, error in ranking_map(batch):
+                    if row:
+                        rows.append(row)
+                    else:
+                        if error:
+                            logger.error(f"用户 {user_id} 排序表生成失败: {error}")
+                        results['failed'] += 1
                 
-                success = self.ranking_service.update_user_ranking(
-                    user_id=user_id,
-                    source_key=self.conference_id,
-                    paper_ids=paper_ids,
-                    force_update=force_update
-                )
+                try:
+                    results['success'] += self.ranking_service.save_rankings(rows)
+                except Exception as e:
+                    self.session.rollback()
+                    logger.error(f"批量保存排序表失败: {e}")
+                    results['failed'] += len(rows)
                 
-                if success:
-                    results['success'] += 1
-                else:
-                    results['failed'] += 1
-                    
-            except Exception as e:
-                logger.error(f"用户 {user_id} 排序表生成失败: {e}")
-                results['failed'] += 1
-            
-            if i % 10 == 0:
-                logger.info(f"进度: {i}/{len(users)} - 成功: {results['success']}, 失败: {results['failed']}, 跳过: {results['skipped']}")
+                processed += len(batch)
+                logger.info(f"进度: {processed}/{results['total']} - 成功: {results['success']}, 失败: {results['failed']}, 跳过: {results['skipped']}")
+        finally:
+            if executor:
+                executor.shutdown()
         
         results['message'] = f"处理完成: 成功 {results['success']}, 失败 {results['failed']}, 跳过 {results['skipped']}"
         results['success_flag'] = results['failed'] == 0
@@ -182,105 +324,128 @@ class ConferenceProcessor:
     
     # ==================== CONTENT GENERATION ====================
     
-    def get_papers_without_content(self, limit: int = 100) -> List[Paper]:
+    def get_papers_without_content(self, limit: int = 100, seed: Optional[str] = None) -> List[Paper]:
         """获取没有翻译和AI解读的论文"""
-        from sqlalchemy import text
-        
-        query = text("""
-            SELECT p.* FROM papers p
-            WHERE p.source = :source
-            AND NOT EXISTS (
-                SELECT 1 FROM paper_translations pt WHERE pt.paper_id = p.id
+        # 按 md5(id || seed) 排序随机抽样：指定 seed 时结果可复现，未指定时每次随机
+        # 与 ORDER BY random() 一样需要对全部候选排序，只是多了可复现性
+        if seed is None:
+            seed = str(random.random())
+        stmt = (
+            select(Paper)
+            .where(
+                Paper.source == self.source_key,
+                ~exists().where(PaperTranslation.paper_id == Paper.id),
+                ~exists().where(PaperInterpretation.paper_id == Paper.id),
             )
-            AND NOT EXISTS (
-                SELECT 1 FROM paper_interpretations pi WHERE pi.paper_id = p.id
-            )
-            ORDER BY RANDOM()
-            LIMIT :limit
-        """)
-        
-        result = self.session.execute(query, {"source": self.source_key, "limit": limit})
-        paper_rows = result.fetchall()
-        
-        papers = []
-        for row in paper_rows:
-            paper = self.session.get(Paper, row.id)
-            if paper:
-                # 强制加载属性并从session分离
-                _ = paper.id, paper.title, paper.summary, paper.authors, paper.categories, paper.arxiv_id
-                self.session.expunge(paper)
-                papers.append(paper)
+            .options(load_only(
+                Paper.id, Paper.title, Paper.summary, Paper.authors, Paper.categories, Paper.arxiv_id
+            ))
+            .order_by(func.md5(cast(Paper.id, String) + seed))
+            .limit(limit)
+        )
         
+        papers = self.session.scalars(stmt).all()
+        # 一次性从session分离，避免多线程访问session
+        self.session.expunge_all()
         return papers
     
-    def run_content_generation(self, steps: List[str] = None, batch_size: int = 50) -> Dict:
+    def run_content_generation(self, steps: List[str] = None, batch_size: int = 50,
+                               seed: Optional[str] = None) -> Dict:
         """生成翻译/AI解读/TTS内容"""
         if steps is None:
             steps = ['trans', 'ai', 'tts']
         
         logger.info(f"开始为 {self.conference_id} 生成内容: {steps}")
         
-        papers = self.get_papers_without_content(limit=batch_size)
+        papers = self.get_papers_without_content(limit=batch_size, seed=seed)
         if not papers:
             return {'success': True, 'message': '所有论文都已有内容，无需生成'}
         
         logger.info(f"找到 {len(papers)} 篇需要生成内容的论文")
         
         results = {'translations': 0, 'interpretations': 0, 'tts': 0}
+        translations, interpretations = {}, {}
         
-        # 生成翻译
-        if 'trans' in steps:
-            try:
-                from app.services.content_generation.translation_generate_v2 import generate_translations_for_papers
-                translations = generate_translations_for_papers(papers, max_workers=50)
-                
-                # 保存到数据库
-                with SessionLocal() as save_session:
-                    for paper in papers:
-                        if paper.id in translations:
-                            title_zh, summary_zh = translations[paper.id]
-                            existing = save_session.query(PaperTranslation).filter(
-                                PaperTranslation.paper_id == paper.id
-                            ).first()
-                            if not existing:
-                                translation = PaperTranslation(
-                                    paper_id=paper.id,
-                                    title_zh=title_zh,
-                                    summary_zh=summary_zh,
-                                    model_name="deepseek-reasoner"
-                                )
-                                save_session.add(translation)
-                                results['translations'] += 1
-                    save_session.commit()
-                logger.info(f"翻译完成: {results['translations']} 篇")
-            except Exception as e:
-                logger.error(f"翻译生成失败: {e}")
+        # 小批量时翻译与解读合并为一次请求，跳过线程池；解析失败的论文回退到常规流程
+        if 'trans' in steps and 'ai' in steps and len(papers) <= COMBINED_GENERATION_MAX_PAPERS:
+            from app.services.llm import get_deepseek_clients
+            client = get_deepseek_clients()[0]
+            for paper in papers:
+                combined = _combined_gen(client, paper)
+                if combined:
+                    translations[paper.id], interpretations[paper.id] = combined
+            papers = [paper for paper in papers if paper.id not in translations]
         
-        # 生成AI解读
-        if 'ai' in steps:
-            try:
+        # 翻译与解读都受限于 API 延迟，两路并行提交，各占一半并发
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            translation_future = interpretation_future = None
+            if 'trans' in steps and papers:
+                from app.services.content_generation.translation_generate_v2 import generate_translations_for_papers
+                translation_future = pool.submit(generate_translations_for_papers, papers, max_workers=25)
+            if 'ai' in steps and papers:
                 from app.services.content_generation.ai_interpretation_generate_v2 import generate_interpretations_for_papers
-                interpretations = generate_interpretations_for_papers(papers, max_workers=50)
+                interpretation_future = pool.submit(generate_interpretations_for_papers, papers, max_workers=25)
+            
+            # 翻译与解读共用一个保存会话，每步一次批量写入
+            with SessionLocal() as save_session:
+                # 保存翻译
+                if translations or translation_future is not None:
+                    try:
+                        if translation_future is not None:
+                            translations.update(translation_future.result())
+                        
+                        # 一次查询已有翻译，批量插入其余
+                        existing = set(save_session.scalars(
+                            select(PaperTranslation.paper_id).where(
+                                PaperTranslation.paper_id.in_(list(translations.keys()))
+                            )
+                        ).all())
+                        rows = [
+                            {
+                                'paper_id': paper_id,
+                                'title_zh': title_zh,
+                                'summary_zh': summary_zh,
+                                'model_name': "deepseek-reasoner"
+                            }
+                            for paper_id, (title_zh, summary_zh) in translations.items()
+                            if paper_id not in existing
+                        ]
+                        save_session.bulk_insert_mappings(PaperTranslation, rows)
+                        save_session.commit()
+                        results['translations'] = len(rows)
+                        logger.info(f"翻译完成: {results['translations']} 篇")
+                    except Exception as e:
+                        save_session.rollback()
+                        logger.error(f"翻译生成失败: {e}")
                 
-                with SessionLocal() as save_session:
-                    for paper in papers:
-                        if paper.id in interpretations:
-                            existing = save_session.query(PaperInterpretation).filter(
-                                PaperInterpretation.paper_id == paper.id
-                            ).first()
-                            if not existing:
-                                interpretation = PaperInterpretation(
-                                    paper_id=paper.id,
-                                    interpretation=interpretations[paper.id],
-                                    language="zh",
-                                    model_name="deepseek-reasoner"
-                                )
-                                save_session.add(interpretation)
-                                results['interpretations'] += 1
-                    save_session.commit()
-                logger.info(f"AI解读完成: {results['interpretations']} 篇")
-            except Exception as e:
-                logger.error(f"AI解读生成失败: {e}")
+                # 保存AI解读
+                if interpretations or interpretation_future is not None:
+                    try:
+                        if interpretation_future is not None:
+                            interpretations.update(interpretation_future.result())
+                        
+                        existing = set(save_session.scalars(
+                            select(PaperInterpretation.paper_id).where(
+                                PaperInterpretation.paper_id.in_(list(interpretations.keys()))
+                            )
+                        ).all())
+                        rows = [
+                            {
+                                'paper_id': paper_id,
+                                'interpretation': interpretation,
+                                'language': "zh",
+                                'model_name': "deepseek-reasoner"
+                            }
+                            for paper_id, interpretation in interpretations.items()
+                            if paper_id not in existing
+                        ]
+                        save_session.bulk_insert_mappings(PaperInterpretation, rows)
+                        save_session.commit()
+                        results['interpretations'] = len(rows)
+                        logger.info(f"AI解读完成: {results['interpretations']} 篇")
+                    except Exception as e:
+                        save_session.rollback()
+                        logger.error(f"AI解读生成失败: {e}")
         
         # TTS生成 (可选)
         if 'tts' in steps:
@@ -294,7 +459,8 @@ class ConferenceProcessor:
     # ==================== MAIN RUNNER ====================
     
     def run(self, import_papers: bool = False, pool: bool = False, content: bool = False,
-            force_update: bool = False, max_users: int = None, content_steps: List[str] = None) -> Dict:
+            force_update: bool = False, max_users: int = None, content_steps: List[str] = None,
+            workers: int = 1, seed: Optional[str] = None) -> Dict:
         """运行指定的处理步骤"""
         results = {}
         
@@ -305,10 +471,12 @@ class ConferenceProcessor:
                 results['import'] = self.run_import()
             
             if pool:
-                results['pool'] = self.run_pool_generation(force_update=force_update, max_users=max_users)
+                results['pool'] = self.run_pool_generation(
+                    force_update=force_update, max_users=max_users, workers=workers
+                )
             
             if content:
-                results['content'] = self.run_content_generation(steps=content_steps)
+                results['content'] = self.run_content_generation(steps=content_steps, seed=seed)
             
         finally:
             self.cleanup_session()
@@ -339,27 +507,24 @@ def get_conference_status(conference_id: str) -> Dict:
     with SessionLocal() as session:
         source_key = f"conf/{conference_id}"
         
-        # 论文数量
-        paper_count = session.execute(
-            select(Paper.id).where(Paper.source == source_key)
-        ).scalars().all()
-        
-        # 已翻译数量
-        translated_count = 0
-        if paper_count:
-            from sqlalchemy import func
-            translated_count = session.query(func.count(PaperTranslation.id)).join(
-                Paper, PaperTranslation.paper_id == Paper.id
-            ).filter(Paper.source == source_key).scalar() or 0
-        
-        # 用户排序表数量
-        ranking_count = session.query(UserPaperRanking).filter(
+        # 论文数、已翻译数、用户排序表数合并为一次查询
+        paper_count_q = select(func.count(Paper.id)).where(
+            Paper.source == source_key
+        ).scalar_subquery()
+        translated_count_q = select(func.count(PaperTranslation.id)).join(
+            Paper, PaperTranslation.paper_id == Paper.id
+        ).where(Paper.source == source_key).scalar_subquery()
+        ranking_count_q = select(func.count(UserPaperRanking.id)).where(
             UserPaperRanking.source_key == conference_id
-        ).count()
+        ).scalar_subquery()
+        
+        paper_count, translated_count, ranking_count = session.execute(
+            select(paper_count_q, translated_count_q, ranking_count_q)
+        ).one()
         
         return {
             'conference_id': conference_id,
-            'paper_count': len(paper_count),
+            'paper_count': paper_count,
             'translated_count': translated_count,
             'ranking_count': ranking_count
         }
@@ -376,8 +541,11 @@ def main():
     parser.add_argument('--all', action='store_true', help='执行所有步骤')
     parser.add_argument('--force', action='store_true', help='强制更新已存在的数据')
     parser.add_argument('--max-users', type=int, help='限制处理的最大用户数')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='推荐池生成的并行进程数 (默认: 1，即单进程)')
     parser.add_argument('--steps', nargs='+', choices=['trans', 'ai', 'tts'], 
                         default=['trans', 'ai'], help='内容生成步骤')
+    parser.add_argument('--seed', help='内容生成论文抽样的随机种子 (指定后抽样结果可复现)')
     
     args = parser.parse_args()
     
@@ -389,7 +557,7 @@ def main():
         parser.print_help()
         return
     
-    if args.conference not in SUPPORTED_2025_CONFERENCES:
+    if args.conference not in _SUPPORTED_IDS:
         print(f"❌ 不支持的会议: {args.conference}")
         print(f"支持的会议: {', '.join(SUPPORTED_2025_CONFERENCES.keys())}")
         sys.exit(1)
@@ -422,7 +590,9 @@ def main():
         content=content,
         force_update=args.force,
         max_users=args.max_users,
-        content_steps=args.steps
+        workers=args.workers,
+        content_steps=args.steps,
+        seed=args.seed
     )
     
     print("\n📋 处理结果:")
@@ -20,6 +20,8 @@ Arxiv Content Factory Script (每日刷新)
 import sys
 import asyncio
 import subprocess
+import threading
+from collections import deque
 from pathlib import Path
 backend_root = Path(__file__).parent.parent
 sys.path.insert(0, str(backend_root))
@@ -32,39 +34,56 @@ from app.core.config import settings
 from app.services.data_ingestion.arxiv_candidate_pool import CandidatePoolServiceV2, cs_filter
 
 
+# 进程内步骤的超时 (秒)，与原先子进程方式的超时一致
+STEP_TIMEOUT = 3600
+
+
 def get_target_date() -> date:
     """计算目标日期 (T-3)"""
     return date.today() - timedelta(days=settings.arxiv_submission_delay_days)
 
 
-def run_script(script_path: str, args: list, description: str) -> bool:
-    """运行子脚本并捕获输出"""
+def run_script(script_path: str, args: list, description: str, timeout: int = STEP_TIMEOUT) -> bool:
+    """运行子脚本并逐行转发输出"""
     logger.info(f"🚀 执行: {description}")
     try:
         cmd = [sys.executable, script_path] + args
-        result = subprocess.run(
+        proc = subprocess.Popen(
             cmd,
             cwd=str(backend_root),
-            capture_output=True,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
             text=True,
-            timeout=3600  # 1小时超时
+            bufsize=1
         )
-        if result.returncode == 0:
+        # 超时由计时器强制结束子进程 (默认1小时)
+        timer = threading.Timer(timeout, proc.kill)
+        timer.start()
+        # 只保留最后几行用于结束时汇总，不缓存全部输出
+        tail = deque(maxlen=5)
+        try:
+            for line in proc.stdout:
+                line = line.rstrip()
+                tail.append(line)
+                logger.debug(line)
+            returncode = proc.wait()
+        finally:
+            timed_out = not timer.is_alive()
+            timer.cancel()
+        
+        if timed_out:
+            logger.error(f"❌ {description} 超时")
+            return False
+        if returncode == 0:
             logger.success(f"✅ {description} 完成")
-            if result.stdout:
-                # 只显示最后几行
-                lines = result.stdout.strip().split('\n')
-                for line in lines[-5:]:
-                    logger.info(f"   {line}")
+            for line in tail:
+                logger.info(f"   {line}")
             return True
         else:
-            logger.error(f"❌ {description} 失败 (exit code: {result.returncode})")
-            if result.stderr:
-                logger.error(result.stderr[-500:])
+            logger.error(f"❌ {description} 失败 (exit code: {returncode})")
+            for line in tail:
+                logger.error(f"   {line}")
             return False
-    except subprocess.TimeoutExpired:
-        logger.error(f"❌ {description} 超时")
-        return False
     except Exception as e:
         logger.exception(f"❌ {description} 异常: {e}")
         return False
@@ -107,52 +126,65 @@ def step_1_ensure_candidate_pool(target_date: date) -> bool:
         db.close()
 
 
-def step_2_generate_translation_interpretation(target_date: date) -> bool:
+async def step_2_generate_translation_interpretation(target_date: date) -> bool:
     """步骤2: 生成翻译和AI解读"""
     logger.info("=== Step 2: 生成翻译和AI解读 ===")
     
-    script_path = str(backend_root / "scripts" / "arxiv_base_content_generate" / "generate_daily_content_full.py")
-    date_str = target_date.strftime("%Y-%m-%d")
+    # 进程内调用，复用已加载的模型与连接池，避免子进程重复启动
+    from scripts.arxiv_base_content_generate.generate_daily_content_full import generate_content_for_date
     
     # 只运行翻译和解读步骤，跳过TTS (我们用独立的opus脚本)
-    return run_script(
-        script_path,
-        ["--date", date_str, "--steps", "trans,ai"],
-        f"Translation & Interpretation for {date_str}"
-    )
+    try:
+        await asyncio.wait_for(
+            asyncio.to_thread(
+                generate_content_for_date, target_date, do_trans=True, do_ai=True, do_tts=False
+            ),
+            timeout=STEP_TIMEOUT
+        )
+        logger.success(f"✅ Translation & Interpretation for {target_date} 完成")
+        return True
+    except asyncio.TimeoutError:
+        # to_thread 中的线程无法取消，超时后只是不再等待，继续后续步骤
+        logger.error(f"❌ Translation & Interpretation for {target_date} 超时 ({STEP_TIMEOUT}s)，后台线程可能仍在运行")
+        return False
+    except Exception as e:
+        logger.exception(f"❌ Translation & Interpretation for {target_date} 异常: {e}")
+        return False
 
 
-def step_3_generate_tts_opus(target_date: date) -> bool:
+async def step_3_generate_tts_opus(target_date: date) -> bool:
     """步骤3: 生成 TTS 音频 (Opus格式)"""
     logger.info("=== Step 3: 生成 TTS 音频 (Opus) ===")
     
-    script_path = str(backend_root / "scripts" / "tts" / "generate_cs_tts_parallel.py")
-    date_str = target_date.strftime("%Y-%m-%d")
+    from scripts.tts.generate_cs_tts_parallel import run_for_date
     
-    return run_script(
-        script_path,
-        ["--date", date_str, "--concurrency", "6"],
-        f"TTS Opus Generation for {date_str}"
-    )
+    try:
+        return await asyncio.wait_for(run_for_date(target_date, concurrency=6), timeout=STEP_TIMEOUT)
+    except asyncio.TimeoutError:
+        logger.error(f"❌ TTS Opus Generation for {target_date} 超时 ({STEP_TIMEOUT}s)")
+        return False
+    except Exception as e:
+        logger.exception(f"❌ TTS Opus Generation for {target_date} 异常: {e}")
+        return False
 
 
-def step_4_upload_to_cos(target_date: date) -> bool:
+async def step_4_upload_to_cos(target_date: date) -> bool:
     """步骤4: 上传音频到 COS 对象存储"""
     logger.info("=== Step 4: 上传 TTS 到 COS ===")
     
     script_path = str(backend_root / "scripts" / "cos" / "upload_paper_audio.py")
     date_str = target_date.strftime("%Y-%m-%d")
     
-    return run_script(
+    # 上传脚本为独立部署，仍以子进程运行，放到线程中避免阻塞事件循环
+    return await asyncio.to_thread(
+        run_script,
         script_path,
         ["--date", date_str, "--workers", "20"],
         f"COS Upload for {date_str}"
     )
 
 
-def main():
-    logger.add("logs/daily_arxiv_factory.log", rotation="1 day", retention="7 days")
-    
+async def main():
     logger.info("========================================")
     logger.info("🏭 Arxiv Content Factory 每日刷新")
     logger.info(f"📅 执行日期: {date.today()}")
@@ -167,15 +199,15 @@ def main():
         return
     
     # Step 2: 翻译 + 解读
-    if not step_2_generate_translation_interpretation(target_date):
+    if not await step_2_generate_translation_interpretation(target_date):
         logger.warning("翻译/解读可能有部分失败，继续执行TTS...")
     
     # Step 3: TTS 生成 (Opus)
-    if not step_3_generate_tts_opus(target_date):
+    if not await step_3_generate_tts_opus(target_date):
         logger.warning("TTS可能有部分失败，继续执行COS上传...")
     
     # Step 4: COS 上传
-    if not step_4_upload_to_cos(target_date):
+    if not await step_4_upload_to_cos(target_date):
         logger.warning("COS上传可能有部分失败")
     
     logger.info("========================================")
@@ -184,4 +216,6 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
+    # 独立运行时写入专用日志；被 factory 进程内调用时沿用调用方的 sink，避免重复添加
+    logger.add("logs/daily_arxiv_factory.log", rotation="1 day", retention="7 days")
+    asyncio.run(main())
@@ -24,6 +24,9 @@ from app.services.data_ingestion.conference_import import (
     SUPPORTED_2025_CONFERENCES
 )
 
+# 支持的会议ID集合，导入时固化
+_SUPPORTED_IDS = frozenset(SUPPORTED_2025_CONFERENCES)
+
 
 def list_available_conferences():
     """列出可用的会议数据"""
@@ -45,7 +48,7 @@ def list_available_conferences():
 
 def import_single_conference(conference_id: str):
     """导入单个会议数据"""
-    if conference_id not in SUPPORTED_2025_CONFERENCES:
+    if conference_id not in _SUPPORTED_IDS:
         print(f"❌ 不支持的会议: {conference_id}")
         print(f"支持的会议: {', '.join(SUPPORTED_2025_CONFERENCES.keys())}")
         return False
@@ -1,9 +1,18 @@
+import asyncio
+import gzip
+import math
+from itertools import islice
+from contextlib import contextmanager
+from datetime import date
+from functools import lru_cache
+
 import httpx
-import pendulum
+import orjson
 import argparse
 from loguru import logger
-from sqlalchemy import select, and_, or_
-from sqlalchemy.orm import Session
+from sqlalchemy import event, func, insert, select, update, or_
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session, raiseload, selectinload
 from typing import List, Optional
 import uuid
 
@@ -15,116 +24,151 @@ from app.models.paper import PaperEmbedding
 from app.models.candidate_pool import CandidatePool
 from app.core.config import settings
 
-def date_to_uuid(target_date: pendulum.Date) -> uuid.UUID:
-    """将日期转换为确定性的UUID"""
+# 分批推送时每次从数据库流式取出的论文数
+PAPER_YIELD_PER = 20
+# 同时在途的推送请求数
+PUSH_CONCURRENCY = 8
+# build_batch_payload 中 selectinload 预加载的关系数
+SELECTIN_RELATIONSHIPS = 4
+# 排序表单独分页推送，避免全部堆进一个批次
+RANKING_PAGE_SIZE = 200
+
+@lru_cache(maxsize=512)
+def date_to_uuid(target_date: date) -> uuid.UUID:
+    """将日期转换为确定性的UUID (结果确定，按日期缓存)"""
     date_str = target_date.isoformat()
     return uuid.uuid5(uuid.NAMESPACE_DNS, f"candidate_pool_date_{date_str}")
 
-def pull_cloud_user_data(local_db: Session, cloud_url: str, headers: dict):
+@contextmanager
+def count_queries(local_db: Session):
+    """统计代码块内发出的 SQL 语句数，用于发现隐藏的 N+1 查询"""
+    bind = local_db.get_bind()
+    counter = {"count": 0}
+    
+    def _on_execute(conn, cursor, statement, parameters, context, executemany):
+        counter["count"] += 1
+    
+    event.listen(bind, "before_cursor_execute", _on_execute)
+    try:
+        yield counter
+    finally:
+        event.remove(bind, "before_cursor_execute", _on_execute)
+
+def create_cloud_client(cloud_url: str, headers: dict) -> httpx.AsyncClient:
+    """创建复用连接的云端 API 客户端 (keep-alive 连接池，拉取与推送共用)"""
+    return httpx.AsyncClient(
+        base_url=cloud_url,
+        headers=headers,
+        timeout=120.0,
+        limits=httpx.Limits(max_keepalive_connections=PUSH_CONCURRENCY)
+    )
+
+async def pull_cloud_user_data(local_db: Session, client: httpx.AsyncClient):
     """从云端拉取最新的用户画像和反馈，同步到本地数据库"""
     logger.info("正在从云端拉取用户数据...")
     try:
-        response = httpx.get(f"{cloud_url}/export/users", headers=headers)
+        response = await client.get("/export/users")
         response.raise_for_status()
         data = response.json()
         
-        # 1. 同步用户画像
-        for p_data in data["profiles"]:
-            profile = local_db.scalar(select(UserProfile).where(UserProfile.user_id == p_data["user_id"]))
-            if not profile:
-                profile = UserProfile(user_id=p_data["user_id"])
-                local_db.add(profile)
-            
-            profile.interested_categories = p_data["interested_categories"]
-            profile.research_keywords = p_data["research_keywords"]
-            profile.preference_description = p_data["preference_description"]
-            profile.onboarding_completed = p_data["onboarding_completed"]
+        # 1. 同步用户画像：一条 INSERT ... ON CONFLICT 批量 upsert (同一用户以最后一条为准)
+        profile_rows = {
+            p_data["user_id"]: {
+                "user_id": p_data["user_id"],
+                "interested_categories": p_data["interested_categories"],
+                "research_keywords": p_data["research_keywords"],
+                "preference_description": p_data["preference_description"],
+                "onboarding_completed": p_data["onboarding_completed"],
+            }
+            for p_data in data["profiles"]
+        }
+        if profile_rows:
+            stmt = pg_insert(UserProfile).values(list(profile_rows.values()))
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[UserProfile.user_id],
+                set_={
+                    "interested_categories": stmt.excluded.interested_categories,
+                    "research_keywords": stmt.excluded.research_keywords,
+                    "preference_description": stmt.excluded.preference_description,
+                    "onboarding_completed": stmt.excluded.onboarding_completed,
+                    "updated_at": func.now(),
+                }
+            )
+            local_db.execute(stmt)
+        
+        # 2. 同步用户反馈：一次查出 arxiv_id -> paper.id 与已有反馈，批量插入缺失的记录
+        # user_feedback 没有 (user_id, paper_id) 唯一约束，无法用 ON CONFLICT，改为预取已有记录后过滤
+        arxiv_ids = list({f_data["arxiv_id"] for f_data in data["feedback"]})
+        arxiv_to_paper_id = {}
+        for j in range(0, len(arxiv_ids), 1000):
+            arxiv_to_paper_id.update(local_db.execute(
+                select(Paper.arxiv_id, Paper.id).where(Paper.arxiv_id.in_(arxiv_ids[j:j + 1000]))
+            ).tuples().all())
         
-        # 2. 同步用户反馈
+        paper_ids = list(set(arxiv_to_paper_id.values()))
+        existing_pairs = set()
+        for j in range(0, len(paper_ids), 1000):
+            existing_pairs.update(local_db.execute(
+                select(UserFeedback.user_id, UserFeedback.paper_id).where(
+                    UserFeedback.paper_id.in_(paper_ids[j:j + 1000])
+                )
+            ).tuples().all())
+        
+        feedback_rows = []
         for f_data in data["feedback"]:
-            paper = local_db.scalar(select(Paper).where(Paper.arxiv_id == f_data["arxiv_id"]))
-            if not paper:
+            paper_id = arxiv_to_paper_id.get(f_data["arxiv_id"])
+            if paper_id is None or (f_data["user_id"], paper_id) in existing_pairs:
                 continue
-                
-            feedback = local_db.scalar(
-                select(UserFeedback).where(
-                    and_(
-                        UserFeedback.user_id == f_data["user_id"],
-                        UserFeedback.paper_id == paper.id
-                    )
-                )
-            )
-            if not feedback:
-                feedback = UserFeedback(
-                    user_id=f_data["user_id"],
-                    paper_id=paper.id,
-                    feedback_type=f_data["feedback_type"]
-                )
-                local_db.add(feedback)
+            existing_pairs.add((f_data["user_id"], paper_id))
+            feedback_rows.append({
+                "user_id": f_data["user_id"],
+                "paper_id": paper_id,
+                "feedback_type": f_data["feedback_type"]
+            })
+        if feedback_rows:
+            local_db.execute(insert(UserFeedback), feedback_rows)
         
         local_db.commit()
         logger.success(f"已同步 {len(data['profiles'])} 个用户画像和 {len(data['feedback'])} 条反馈")
     except Exception as e:
         logger.error(f"拉取云端数据失败: {e}")
 
-def push_local_processing_results(
-    local_db: Session, 
-    cloud_url: str, 
-    headers: dict, 
-    target_date: Optional[pendulum.Date] = None, 
-    source_key: Optional[str] = None,
-    batch_size: int = 50,
-    limit: Optional[int] = None
-):
-    """将本地生成的论文、翻译、解读、推荐排序, TTS, Embedding 推送到云端"""
-    if target_date:
-        logger.info(f"正在准备推送日期 {target_date} 的处理结果 (Batch Size: {batch_size})...")
-        batch_id = date_to_uuid(target_date)
-        stmt = select(CandidatePool.paper_id).where(
-            CandidatePool.batch_id == batch_id,
-            CandidatePool.filter_type == 'cs'
-        )
-        paper_ids = list(local_db.execute(stmt).scalars().all())
-    elif source_key:
-        logger.info(f"正在准备推送 Source: {source_key} 的处理结果 (Batch Size: {batch_size})...")
-        stmt = select(Paper.id).where(Paper.source.like(f"%{source_key}%"))
-        if limit:
-            stmt = stmt.limit(limit)
-        paper_ids = list(local_db.execute(stmt).scalars().all())
-    else:
-        logger.error("必须提供 target_date 或 source_key")
-        return
-
-    if not paper_ids:
-        logger.warning("未找到匹配的论文，请先确认本地数据")
-        return
-
-    logger.info(f"匹配到 {len(paper_ids)} 篇论文，开始分批推送...")
+def build_batch_payload(
+    local_db: Session,
+    chunk_ids: list,
+    id_to_arxiv: Optional[dict] = None,
+    force_embeddings: bool = False
+) -> tuple[dict, list]:
+    """查询一批论文及其关联内容，构建推送 payload 并返回其中的 embedding id；顺带记录 id -> arxiv_id 供排序表复用"""
+    # 使用 selectinload 预加载所有关系，避免 lazy load 失败
+    # raiseload('*') 兜底：访问未预加载的关系直接报错，而不是静默逐条 lazy load
+    stmt = select(Paper).where(Paper.id.in_(chunk_ids)).options(
+        selectinload(Paper.translation),
+        selectinload(Paper.interpretation),
+        selectinload(Paper.embeddings),
+        selectinload(Paper.tts_files),
+        raiseload('*')
+    )
     
-    from sqlalchemy.orm import selectinload
+    payload = {
+        "papers": [],
+        "translations": [],
+        "interpretations": [],
+        "tts_records": [],
+        "rankings": [],
+        "embeddings": []
+    }
+    embedding_ids = []
     
-    # 分批处理
-    for i in range(0, len(paper_ids), batch_size):
-        chunk_ids = paper_ids[i:i + batch_size]
-        # 使用 selectinload 预加载所有关系，避免 lazy load 失败
-        stmt = select(Paper).where(Paper.id.in_(chunk_ids)).options(
-            selectinload(Paper.translation),
-            selectinload(Paper.interpretation),
-            selectinload(Paper.embeddings),
-            selectinload(Paper.tts_files)
-        )
-        papers = local_db.scalars(stmt).all()
-        
-        payload = {
-            "papers": [],
-            "translations": [],
-            "interpretations": [],
-            "tts_records": [],
-            "rankings": [],
-            "embeddings": []
-        }
-        
-        for p in papers:
+    # 预期查询数: 主查询 1 条 + 每个 yield 分块 4 条 selectinload
+    expected_queries = 1 + SELECTIN_RELATIONSHIPS * math.ceil(len(chunk_ids) / PAPER_YIELD_PER)
+    
+    # yield_per 分块迭代，逐块构建 payload，不一次性持有整批 ORM 对象 (含 embedding 向量)
+    with count_queries(local_db) as queries:
+        for p in local_db.scalars(stmt.execution_options(yield_per=PAPER_YIELD_PER)):
+            if id_to_arxiv is not None:
+                id_to_arxiv[p.id] = p.arxiv_id
+            
             # 基础数据
             payload["papers"].append({
                 "arxiv_id": p.arxiv_id,
@@ -145,7 +189,7 @@ def push_local_processing_results(
                     "summary_zh": p.translation.summary_zh,
                     "model_name": p.translation.model_name
                 })
-                
+            
             # 解读
             if p.interpretation:
                 payload["interpretations"].append({
@@ -168,58 +212,233 @@ def push_local_processing_results(
             # Embeddings
             if p.embeddings:
                 for emb in p.embeddings:
-                    vector = list(emb.vector) if hasattr(emb.vector, '__iter__') else emb.vector
+                    # 推送后未再更新的向量跳过，向量是 payload 中最大的部分
+                    if not force_embeddings and emb.pushed_at and emb.pushed_at >= emb.updated_at:
+                        continue
+                    embedding_ids.append(emb.id)
+                    # 向量原样交给 orjson 序列化 (list 或 numpy 数组均可)，不再逐元素复制成新 list
                     payload["embeddings"].append({
                         "arxiv_id": p.arxiv_id,
                         "model_name": emb.model_name,
-                        "vector": vector
+                        "vector": emb.vector
                     })
-        
-        # Rankings 同步
-        if i == 0:
-            if target_date:
-                # 尝试通过日期 OR source_key 匹配 (因为T-3逻辑, pool_date可能是今天, 但source包含target_date)
-                date_str = target_date.strftime('%Y%m%d')
-                today_str = pendulum.now().strftime('%Y%m%d')
-                rank_stmt = select(UserPaperRanking).where(
-                    or_(
-                        UserPaperRanking.pool_date == target_date,
-                        UserPaperRanking.source_key.like(f"%{date_str}%"),
-                        UserPaperRanking.source_key.like(f"%{today_str}%")
-                    )
-                )
-            else:
-                # 模糊匹配 source_key
-                rank_stmt = select(UserPaperRanking).where(UserPaperRanking.source_key.like(f"%{source_key}%"))
-            
-            rankings = local_db.scalars(rank_stmt).all()
-            for r in rankings:
-                paper_ids_str = []
-                # 优化：批量获取 paper 以减少查询
-                if r.paper_ids:
-                    papers_mapping = {p.id: p.arxiv_id for p in local_db.scalars(select(Paper).where(Paper.id.in_(r.paper_ids))).all()}
-                    for pid in r.paper_ids:
-                        if pid in papers_mapping:
-                            paper_ids_str.append(papers_mapping[pid])
-                
-                payload["rankings"].append({
-                    "user_id": str(r.user_id),
-                    "pool_date": str(r.pool_date) if r.pool_date else None,
-                    "source_key": r.source_key,
-                    "paper_ids": paper_ids_str,
-                    "scores": r.scores
-                })
+    
+    if queries["count"] > expected_queries:
+        logger.warning(f"批次查询数 {queries['count']} 超过预期 {expected_queries}，可能存在 N+1 查询")
+    
+    return payload, embedding_ids
+
+def mark_embeddings_pushed(local_db: Session, embedding_ids: list):
+    """批量标记已成功推送的 embedding (保持 updated_at 不变)"""
+    for j in range(0, len(embedding_ids), 1000):
+        local_db.execute(
+            update(PaperEmbedding)
+            .where(PaperEmbedding.id.in_(embedding_ids[j:j + 1000]))
+            .values(pushed_at=func.now(), updated_at=PaperEmbedding.updated_at)
+        )
+    local_db.commit()
 
+def build_ranking_rows(
+    local_db: Session,
+    target_date: Optional[date] = None,
+    source_key: Optional[str] = None,
+    id_to_arxiv: Optional[dict] = None,
+    today_str: Optional[str] = None
+) -> list:
+    """查询需要同步的用户排序表，并把论文 id 转为 arxiv_id (优先复用已加载论文的映射)"""
+    if target_date:
+        # 尝试通过日期 OR source_key 匹配 (因为T-3逻辑, pool_date可能是今天, 但source包含target_date)
+        date_str = target_date.strftime('%Y%m%d')
+        today_str = today_str or date.today().strftime('%Y%m%d')
+        rank_stmt = select(UserPaperRanking).where(
+            or_(
+                UserPaperRanking.pool_date == target_date,
+                UserPaperRanking.source_key.like(f"%{date_str}%"),
+                UserPaperRanking.source_key.like(f"%{today_str}%")
+            )
+        )
+    else:
+        # 模糊匹配 source_key
+        rank_stmt = select(UserPaperRanking).where(UserPaperRanking.source_key.like(f"%{source_key}%"))
+    
+    rankings = local_db.scalars(rank_stmt).all()
+    rows = []
+    
+    # 已推送批次里加载过的论文直接复用映射，只对缺失的 id 分块查询
+    papers_mapping = dict(id_to_arxiv or {})
+    missing_pids = list({pid for r in rankings for pid in (r.paper_ids or [])} - papers_mapping.keys())
+    for j in range(0, len(missing_pids), 1000):
+        papers_mapping.update(local_db.execute(
+            select(Paper.id, Paper.arxiv_id).where(Paper.id.in_(missing_pids[j:j + 1000]))
+        ).tuples().all())
+    
+    for r in rankings:
+        paper_ids_str = [papers_mapping[pid] for pid in (r.paper_ids or []) if pid in papers_mapping]
+    
+        rows.append({
+            "user_id": str(r.user_id),
+            "pool_date": str(r.pool_date) if r.pool_date else None,
+            "source_key": r.source_key,
+            "paper_ids": paper_ids_str,
+            "scores": r.scores
+        })
+    
+    return rows
+
+def encode_payload(payload: dict, gzip_body: bool = False) -> tuple[bytes, dict]:
+    """序列化推送 payload，可选 gzip 压缩 (level 1，CPU 开销小)"""
+    # orjson 在 C 层序列化，OPT_SERIALIZE_NUMPY 支持 numpy 向量直接输出
+    body = orjson.dumps(payload, option=orjson.OPT_SERIALIZE_NUMPY)
+    headers = {"Content-Type": "application/json"}
+    if gzip_body:
+        body = gzip.compress(body, compresslevel=1)
+        headers["Content-Encoding"] = "gzip"
+    return body, headers
+
+async def _post_batch(
+    client: httpx.AsyncClient,
+    semaphore: asyncio.Semaphore,
+    batch_no: int,
+    payload: dict,
+    gzip_body: bool = False
+) -> bool:
+    """推送单个批次，信号量限制同时在途的请求数，返回是否成功"""
+    async with semaphore:
         try:
-            logger.info(f"正在推送批次 {i//batch_size + 1}...")
-            response = httpx.post(f"{cloud_url}/ingest/batch", json=payload, headers=headers, timeout=120.0)
+            logger.info(f"正在推送批次 {batch_no}...")
+            body, headers = await asyncio.to_thread(encode_payload, payload, gzip_body)
+            response = await client.post("/ingest/batch", content=body, headers=headers)
             response.raise_for_status()
             res_json = response.json()
-            logger.success(f"推送批次 {i//batch_size + 1} 成功: papers={res_json.get('papers')}, translations={res_json.get('translations')}, interpretations={res_json.get('interpretations')}, tts={res_json.get('tts')}, rankings={res_json.get('rankings')}")
+            logger.success(f"推送批次 {batch_no} 成功: papers={res_json.get('papers')}, translations={res_json.get('translations')}, interpretations={res_json.get('interpretations')}, tts={res_json.get('tts')}, rankings={res_json.get('rankings')}")
+            return True
         except Exception as e:
-            logger.error(f"推送批次 {i//batch_size + 1} 失败: {e}")
+            logger.error(f"推送批次 {batch_no} 失败: {e}")
             if hasattr(e, 'response') and e.response:
                 logger.error(f"错误详情: {e.response.text}")
+            return False
+
+async def push_rankings(
+    client: httpx.AsyncClient,
+    semaphore: asyncio.Semaphore,
+    rank_rows: list,
+    first_batch_no: int = 1,
+    page_size: int = RANKING_PAGE_SIZE,
+    gzip_body: bool = False
+):
+    """排序表按页推送 (只填充 rankings 的批次)，与论文批次共用信号量"""
+    await asyncio.gather(*(
+        _post_batch(
+            client, semaphore, first_batch_no + j // page_size,
+            {"rankings": rank_rows[j:j + page_size]}, gzip_body
+        )
+        for j in range(0, len(rank_rows), page_size)
+    ))
+
+async def push_local_processing_results(
+    local_db: Session, 
+    client: httpx.AsyncClient, 
+    target_date: Optional[date] = None, 
+    source_key: Optional[str] = None,
+    batch_size: int = 50,
+    limit: Optional[int] = None,
+    concurrency: int = PUSH_CONCURRENCY,
+    gzip_body: bool = False,
+    force_embeddings: bool = False
+):
+    """将本地生成的论文、翻译、解读、推荐排序, TTS, Embedding 推送到云端"""
+    # 一次推送只取一次当天日期
+    today_str = date.today().strftime('%Y%m%d')
+    if target_date:
+        logger.info(f"正在准备推送日期 {target_date} 的处理结果 (Batch Size: {batch_size})...")
+        batch_id = date_to_uuid(target_date)
+        stmt = select(CandidatePool.paper_id).where(
+            CandidatePool.batch_id == batch_id,
+            CandidatePool.filter_type == 'cs'
+        )
+    elif source_key:
+        logger.info(f"正在准备推送 Source: {source_key} 的处理结果 (Batch Size: {batch_size})...")
+        stmt = select(Paper.id).where(Paper.source.like(f"%{source_key}%"))
+        if limit:
+            stmt = stmt.limit(limit)
+    else:
+        logger.error("必须提供 target_date 或 source_key")
+        return
+
+    # 服务端游标流式读取论文 id，按批切片，内存占用与数据源大小无关
+    paper_iter = iter(local_db.execute(stmt.execution_options(yield_per=batch_size)).scalars())
+    
+    # 数据库查询在线程中顺序执行 (同一 session 不会并发使用)，网络推送在事件循环中并发
+    semaphore = asyncio.Semaphore(concurrency)
+    # 背压：构建下一批 payload 前先占一个名额，批次推送结束才释放，内存中最多 concurrency 个 payload
+    in_flight = asyncio.Semaphore(concurrency)
+    tasks = []
+    batch_embedding_ids = []
+    id_to_arxiv = {}
+    total = 0
+    while True:
+        await in_flight.acquire()
+        chunk_ids = await asyncio.to_thread(lambda: list(islice(paper_iter, batch_size)))
+        if not chunk_ids:
+            in_flight.release()
+            break
+        total += len(chunk_ids)
+        try:
+            payload, embedding_ids = await asyncio.to_thread(
+                build_batch_payload, local_db, chunk_ids, id_to_arxiv, force_embeddings
+            )
+        except BaseException:
+            in_flight.release()
+            raise
+        batch_embedding_ids.append(embedding_ids)
+        task = asyncio.create_task(
+            _post_batch(client, semaphore, len(tasks) + 1, payload, gzip_body)
+        )
+        task.add_done_callback(lambda _: in_flight.release())
+        tasks.append(task)
+    
+    if not total:
+        logger.warning("未找到匹配的论文，请先确认本地数据")
+        return
+    
+    logger.info(f"匹配到 {total} 篇论文，已分 {len(tasks)} 批提交推送")
+    results = await asyncio.gather(*tasks)
+    
+    # Rankings 同步：云端按 arxiv_id 解析排序表，必须等论文批次全部入库后再推送
+    # 复用 id -> arxiv_id 映射，分页推送
+    rankings = await asyncio.to_thread(
+        build_ranking_rows, local_db, target_date, source_key, id_to_arxiv, today_str
+    )
+    if rankings:
+        logger.info(f"共 {len(rankings)} 条排序表，按每页 {RANKING_PAGE_SIZE} 条推送")
+        await push_rankings(client, semaphore, rankings, len(tasks) + 1, gzip_body=gzip_body)
+    
+    # 只标记推送成功批次中的 embedding，失败批次下次同步时重推
+    pushed_ids = [eid for ok, ids in zip(results, batch_embedding_ids) if ok for eid in ids]
+    if pushed_ids:
+        await asyncio.to_thread(mark_embeddings_pushed, local_db, pushed_ids)
+        logger.info(f"已标记 {len(pushed_ids)} 条 embedding 为已推送")
+
+async def main(args):
+    headers = {"X-Internal-Token": settings.internal_ingest_token}
+    
+    async with create_cloud_client(args.url, headers) as client:
+        with SessionLocal() as db:
+            # 1. 先拉取云端用户画像
+            await pull_cloud_user_data(db, client)
+            
+            # 2. 推送本地处理结果
+            target_date = date.fromisoformat(args.date) if args.date else None
+            await push_local_processing_results(
+                db, 
+                client, 
+                target_date=target_date, 
+                source_key=args.source,
+                batch_size=args.batch_size,
+                limit=args.limit,
+                gzip_body=args.gzip,
+                force_embeddings=args.force_embeddings
+            )
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Master-Worker 同步守护程序")
@@ -228,23 +447,8 @@ if __name__ == "__main__":
     parser.add_argument("--url", type=str, default="http://localhost:8000/api/v1/internal", help="云端 API 地址")
     parser.add_argument("--batch-size", type=int, default=50, help="每批推送的论文数量")
     parser.add_argument("--limit", type=int, help="限制总论文数量（用于测试）")
+    parser.add_argument("--gzip", action="store_true", help="gzip 压缩推送请求体 (需云端支持 Content-Encoding: gzip)")
+    parser.add_argument("--force-embeddings", action="store_true", help="忽略推送记录，重新推送所有 embedding")
     args = parser.parse_args()
 
-    cloud_url = args.url
-    headers = {"X-Internal-Token": settings.internal_ingest_token}
-
-    with SessionLocal() as db:
-        # 1. 先拉取云端用户画像
-        pull_cloud_user_data(db, cloud_url, headers)
-        
-        # 2. 推送本地处理结果
-        target_date = pendulum.parse(args.date).date() if args.date else None
-        push_local_processing_results(
-            db, 
-            cloud_url=cloud_url, 
-            headers=headers, 
-            target_date=target_date, 
-            source_key=args.source,
-            batch_size=args.batch_size,
-            limit=args.limit
-        )
+    asyncio.run(main(args))
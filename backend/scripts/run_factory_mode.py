@@ -1,9 +1,11 @@
-import time
-import schedule
+import asyncio
+import signal
 import subprocess
 import os
 import sys
 from datetime import datetime
+
+import pendulum
 from loguru import logger
 
 # Configuration
@@ -36,44 +38,78 @@ def run_command(command, description):
         logger.error(e.stderr)
         return False
 
+def run_in_process(func, description):
+    """Run a job function inside this interpreter and log the outcome"""
+    logger.info(f"🚀 Starting {description}...")
+    try:
+        func()
+        logger.success(f"✅ {description} Completed Successfully")
+        return True
+    except Exception as e:
+        logger.exception(f"❌ {description} Failed: {e}")
+        return False
+
 def job_daily_refresh():
     """Daily Arxiv Fetch & Content Generation - Standalone Edition"""
     logger.info("⏰ Triggering Daily Refresh Workflow...")
     
+    # Import lazily and call in-process: no interpreter start-up, app modules and DB pool stay warm.
+    # run_command remains for tools that must run as a separate process.
+    from scripts.arxiv_ingestion import fetch_daily_papers
+    import scripts.daily_arxiv_refresh as daily_arxiv_refresh
+    
     # 1. Fetch raw papers first
-    if not run_command("scripts/arxiv_ingestion/fetch_daily_papers.py", "Fetch Daily Arxiv Papers"):
+    if not run_in_process(fetch_daily_papers.main, "Fetch Daily Arxiv Papers"):
         logger.error("🛑 Aborting Daily Refresh due to Fetch Failure")
         return
     
     # 2. Generate content (Translation, Interpretation, TTS)
-    if not run_command("scripts/daily_arxiv_refresh.py", "Daily Arxiv Refresh"):
+    if not run_in_process(lambda: asyncio.run(daily_arxiv_refresh.main()), "Daily Arxiv Refresh"):
         logger.error("🛑 Aborting Daily Refresh due to Content Generation Failure")
         return
     
     logger.success("✨ Daily Refresh Complete - All content saved locally")
 
-def main():
+def seconds_until_next_run(at: str = DAILY_REFRESH_TIME) -> float:
+    """Seconds from now until the next occurrence of the HH:MM local time"""
+    hour, minute = map(int, at.split(":"))
+    now = pendulum.now()
+    next_run = now.set(hour=hour, minute=minute, second=0, microsecond=0)
+    if next_run <= now:
+        next_run = next_run.add(days=1)
+    return (next_run - now).total_seconds()
+
+async def main():
     logger.add("logs/factory_mode.log", rotation="1 day")
     logger.info("🏭 Flopap Factory Mode Started (Standalone Edition)")
     logger.info(f"   - Daily Refresh scheduled at: {DAILY_REFRESH_TIME}")
     logger.info("   - All content will be saved locally (no cloud sync)")
     
-    # Schedule jobs
-    schedule.every().day.at(DAILY_REFRESH_TIME).do(job_daily_refresh)
+    # Stop cleanly on Ctrl+C / SIGTERM instead of polling
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
     
     # Optional: Run once on startup for testing (commented out by default)
-    # job_daily_refresh()
+    # await asyncio.to_thread(job_daily_refresh)
     
-    while True:
+    while not stop.is_set():
+        # Sleep until the next scheduled run (no periodic wake-ups in between)
+        delay = seconds_until_next_run()
+        logger.info(f"⏳ Next Daily Refresh in {delay / 3600:.1f}h")
         try:
-            schedule.run_pending()
-            time.sleep(60)
-        except KeyboardInterrupt:
-            logger.info("🛑 Factory Mode Stopped by User")
+            await asyncio.wait_for(stop.wait(), timeout=delay)
             break
+        except asyncio.TimeoutError:
+            pass
+        
+        try:
+            await asyncio.to_thread(job_daily_refresh)
         except Exception as e:
             logger.exception(f"Unexpected Error in Factory Loop: {e}")
-            time.sleep(60)
+    
+    logger.info("🛑 Factory Mode Stopped")
 
 if __name__ == "__main__":
-    main()
+    asyncio.run(main())
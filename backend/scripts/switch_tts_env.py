@@ -32,33 +32,32 @@ def switch_to_cloud():
     print("🔗 访问URL: https://cdn.flopap.com/tts/tts_opus/")
 
 def update_env_file(key, value):
-    """更新.env文件"""
+    """更新.env文件 (先写临时文件再原子替换，进程中断也不会留下半截文件)"""
     env_file = '/data/proj/flopap/backend/.env'
     
-    if not os.path.exists(env_file):
+    try:
+        with open(env_file, 'r') as f:
+            lines = f.readlines()
+    except FileNotFoundError:
         print(f"⚠️  .env文件不存在，创建新文件")
-        with open(env_file, 'w') as f:
-            f.write(f"{key}={value}\n")
-        return
-    
-    # 读取现有内容
-    with open(env_file, 'r') as f:
-        lines = f.readlines()
+        lines = []
     
-    # 更新或添加配置
-    updated = False
-    for i, line in enumerate(lines):
-        if line.startswith(f"{key}="):
-            lines[i] = f"{key}={value}\n"
-            updated = True
-            break
-    
-    if not updated:
-        lines.append(f"{key}={value}\n")
+    # 更新或添加配置 (保留注释和其它行的原有顺序)
+    prefix = f"{key}="
+    new_line = f"{key}={value}\n"
+    index = next((i for i, line in enumerate(lines) if line.startswith(prefix)), None)
+    if index is None:
+        if lines and not lines[-1].endswith("\n"):
+            lines[-1] += "\n"
+        lines.append(new_line)
+    else:
+        lines[index] = new_line
     
-    # 写回文件
-    with open(env_file, 'w') as f:
+    # 临时文件与目标同目录，保证 os.replace 是同一文件系统内的原子重命名
+    tmp_file = f"{env_file}.tmp"
+    with open(tmp_file, 'w') as f:
         f.writelines(lines)
+    os.replace(tmp_file, env_file)
 
 def show_status():
     """显示当前状态"""
@@ -13,18 +13,23 @@ from loguru import logger
 from app.db.session import SessionLocal
 from app.models.user import User
 from app.models import Paper
-from app.services.recommendation.user_ranking_service import UserRankingService
+from app.services.recommendation.user_ranking_service import UserRankingService, compute_papers_hash
 from app.services.recommendation.arxiv_pool_service import ArxivPoolService
-from sqlalchemy import select, and_, func
+from sqlalchemy import select, and_, func, literal_column
+
+
+# 与 ix_papers_cs_submitted_day 索引表达式一致，按 UTC 取提交日期；
+# 时区写成字面量，psycopg3 服务端绑定参数 ($1) 会让表达式与索引不匹配
+SUBMITTED_DAY = func.date(func.timezone(literal_column("'UTC'"), Paper.submitted_date))
 
 
 def get_dates_with_papers(db, limit=7):
     """获取有 CS 论文的日期列表 (降序)"""
     stmt = (
-        select(func.date(Paper.submitted_date))
-        .where(Paper.primary_category.like('cs.%'))
-        .group_by(func.date(Paper.submitted_date))
-        .order_by(func.date(Paper.submitted_date).desc())
+        select(SUBMITTED_DAY)
+        .where(Paper.is_cs)
+        .group_by(SUBMITTED_DAY)
+        .order_by(SUBMITTED_DAY.desc())
         .limit(limit)
     )
     return [row[0] for row in db.execute(stmt).all()]
@@ -50,46 +55,54 @@ def generate_test_pools():
         if len(paper_dates) < 7:
             logger.warning(f"只有 {len(paper_dates)} 天有数据，不足 7 天，将复用数据")
         
-        # 生成 D0-D6 池
+        # 每个 D 偏移对应的论文只查询一次，所有用户共用
+        day_papers = []
+        for day_offset in range(7):
+            # 映射: D0 用最新日期, D1 用第二新...
+            paper_date_index = min(day_offset, len(paper_dates) - 1)
+            paper_date = paper_dates[paper_date_index]
+            
+            # 获取该日期的 CS 论文
+            papers_stmt = select(Paper.id).where(
+                and_(
+                    Paper.is_cs,
+                    SUBMITTED_DAY == paper_date
+                )
+            ).limit(100)  # 每天限制100篇
+            
+            # 使用今天的日期减去 offset 作为 source_key
+            pool_date = today - timedelta(days=day_offset)
+            source_key = f"{ArxivPoolService.SOURCE_PREFIX}{pool_date.strftime('%Y%m%d')}"
+            paper_ids = list(db.execute(papers_stmt).scalars().all())
+            day_papers.append((day_offset, pool_date, paper_date, source_key, paper_ids, compute_papers_hash(paper_ids)))
+        
+        # 生成 D0-D6 池：先计算所有 (用户, 天) 的排序行，最后一次性批量写入
+        rows = []
         for user in users:
             logger.info(f"\n=== 用户 {user.id} ===")
             
-            for day_offset in range(7):
-                # 映射: D0 用最新日期, D1 用第二新...
-                paper_date_index = min(day_offset, len(paper_dates) - 1)
-                paper_date = paper_dates[paper_date_index]
-                
-                # 获取该日期的 CS 论文
-                papers_stmt = select(Paper.id).where(
-                    and_(
-                        Paper.primary_category.like('cs.%'),
-                        func.date(Paper.submitted_date) == paper_date
-                    )
-                ).limit(100)  # 每天限制100篇
-                
-                paper_ids = list(db.execute(papers_stmt).scalars().all())
-                
+            for day_offset, pool_date, paper_date, source_key, paper_ids, papers_hash in day_papers:
                 if not paper_ids:
                     logger.debug(f"  D{day_offset}: 无论文")
                     continue
                 
-                # 使用今天的日期减去 offset 作为 source_key
-                pool_date = today - timedelta(days=day_offset)
-                source_key = f"{ArxivPoolService.SOURCE_PREFIX}{pool_date.strftime('%Y%m%d')}"
-                
                 # 生成排序
-                success = ranking_service.update_user_ranking(
+                row = ranking_service.build_ranking_row(
                     user_id=user.id,
                     source_key=source_key,
                     paper_ids=paper_ids,
-                    force_update=True
+                    papers_hash=papers_hash
                 )
                 
-                if success:
+                if row:
+                    rows.append(row)
                     logger.info(f"  D{day_offset} ({pool_date}): 用 {paper_date} 的 {len(paper_ids)} 篇论文 -> {source_key}")
                 else:
                     logger.warning(f"  D{day_offset}: 生成失败")
         
+        saved = ranking_service.save_rankings(rows)
+        logger.info(f"批量保存 {saved} 条排序表")
+        
         logger.info("\n=== 测试池生成完成 ===")
         
         # 测试读取
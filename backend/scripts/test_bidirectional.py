@@ -1,3 +1,4 @@
+import asyncio
 import httpx
 import json
 from datetime import date
@@ -6,12 +7,13 @@ from datetime import date
 BASE_URL = "http://localhost:8000/api/v1/internal"
 TOKEN = "test-token-123"
 
-def test_export():
+def create_client() -> httpx.AsyncClient:
+    """Shared keep-alive client for all test calls"""
+    return httpx.AsyncClient(base_url=BASE_URL, headers={"X-Internal-Token": TOKEN})
+
+async def test_export(client: httpx.AsyncClient):
+    response = await client.get("/export/users")
     print("\n--- Testing Export (Cloud -> Local) ---")
-    headers = {"X-Internal-Token": TOKEN}
-    url = f"{BASE_URL}/export/users"
-    
-    response = httpx.get(url, headers=headers)
     print(f"Status: {response.status_code}")
     if response.status_code == 200:
         data = response.json()
@@ -22,11 +24,7 @@ def test_export():
     else:
         print(f"Error: {response.text}")
 
-def test_ingest_rankings():
-    print("\n--- Testing Ingest Rankings (Local -> Cloud) ---")
-    headers = {"X-Internal-Token": TOKEN, "Content-Type": "application/json"}
-    url = f"{BASE_URL}/ingest/batch"
-    
+async def test_ingest_rankings(client: httpx.AsyncClient):
     # We need a valid arxiv_id from the DB
     paper_id = "2512.23903v1"
     
@@ -42,10 +40,15 @@ def test_ingest_rankings():
         ]
     }
     
-    response = httpx.post(url, json=payload, headers=headers)
+    response = await client.post("/ingest/batch", json=payload)
+    print("\n--- Testing Ingest Rankings (Local -> Cloud) ---")
     print(f"Status: {response.status_code}")
     print(f"Response: {json.dumps(response.json(), indent=2)}")
 
+async def main():
+    # Both calls are independent, run them concurrently on one client
+    async with create_client() as client:
+        await asyncio.gather(test_export(client), test_ingest_rankings(client))
+
 if __name__ == "__main__":
-    test_export()
-    test_ingest_rankings()
+    asyncio.run(main())
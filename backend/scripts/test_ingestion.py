@@ -1,3 +1,4 @@
+import asyncio
 import httpx
 import json
 
@@ -34,7 +35,7 @@ payload = {
     ]
 }
 
-def test_ingestion():
+async def test_ingestion():
     headers = {
         "X-Internal-Token": TOKEN,
         "Content-Type": "application/json"
@@ -42,11 +43,12 @@ def test_ingestion():
     
     print(f"Sending request to {API_URL}...")
     try:
-        response = httpx.post(API_URL, json=payload, headers=headers)
+        async with httpx.AsyncClient(headers=headers) as client:
+            response = await client.post(API_URL, json=payload)
         print(f"Status Code: {response.status_code}")
         print(f"Response: {json.dumps(response.json(), indent=2, ensure_ascii=False)}")
     except Exception as e:
         print(f"Error: {e}")
 
 if __name__ == "__main__":
-    test_ingestion()
+    asyncio.run(test_ingestion())
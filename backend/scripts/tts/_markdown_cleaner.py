@@ -0,0 +1,57 @@
+"""
+TTS 朗读前的 markdown 清理 (正则在模块加载时编译一次)
+"""
+import json
+import re
+
+_RE_JSON_BLOCK = re.compile(r'```json\s*(\[.*?\])\s*```', re.DOTALL)
+# 各类语法合并为一个交替正则，一次扫描完成
+# 行首前缀排在粗体/斜体之前：否则 "* **要点**" 的列表星号会被当成斜体开头吞掉
+_RE_MARKDOWN = re.compile(
+    r'(?P<fenced>```[^`]*```)'
+    r'|(?P<code>`(?P<code_text>[^`]+)`)'
+    # 行首标题后紧跟编号/列表前缀时一并删除 (原先标题清掉后编号落到行首会再被清掉)
+    r'|(?P<line_header>^(?P<line_header_ws>\s*)#{1,6}\s*(?P<line_header_prefix>\d+\.\s+|[-*+]\s+)?)'
+    r'|(?P<bullet>^\s*[-*+]\s+)'
+    r'|(?P<numbered>^\s*\d+\.\s+)'
+    r'|(?P<strong>\*\*(?P<strong_text>[^*]+)\*\*)'
+    r'|(?P<em>\*(?P<em_text>[^*]+)\*)'
+    r'|(?P<header>#{1,6}\s*)'
+    r'|(?P<link>\[(?P<link_text>[^\]]+)\]\([^)]+\))',
+    re.MULTILINE
+)
+# 保留内部文字的语法，其余整体删除
+_KEEP_TEXT = frozenset({'code', 'strong', 'em', 'link'})
+_RE_MULTI_NL = re.compile(r'\n{3,}')
+
+
+def _replace_markdown(match: re.Match) -> str:
+    kind = match.lastgroup
+    if kind == 'line_header':
+        # 没有编号前缀时只删标题符号，保留行首空白
+        return '' if match.group('line_header_prefix') else match.group('line_header_ws')
+    return match.group(f'{kind}_text') if kind in _KEEP_TEXT else ''
+
+
+def clean_markdown_for_tts(text: str) -> str:
+    """清理markdown语法，优化TTS朗读"""
+    if not text:
+        return text
+    
+    if text.strip().startswith('```json'):
+        try:
+            json_match = _RE_JSON_BLOCK.search(text)
+            if json_match:
+                json_data = json.loads(json_match.group(1))
+                content_parts = []
+                for item in json_data:
+                    if isinstance(item, dict) and 'zh' in item:
+                        content_parts.append(item['zh'])
+                text = '\n\n'.join(content_parts)
+        except:
+            pass
+    
+    text = _RE_MARKDOWN.sub(_replace_markdown, text)
+    text = _RE_MULTI_NL.sub('\n\n', text)
+    
+    return text.strip()
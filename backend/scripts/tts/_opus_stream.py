@@ -0,0 +1,57 @@
+"""
+edge-tts 的 MP3 音频流直接写入 ffmpeg stdin 编码为 opus (不落临时文件)
+"""
+import asyncio
+from pathlib import Path
+from typing import AsyncIterator, Sequence
+
+# 分段朗读音频的 opus 参数：24kHz、20kbps、voip 模式
+SEGMENT_OPUS_ARGS = ("-c:a", "libopus", "-ar", "24000", "-b:a", "20k", "-application", "voip")
+
+# 压低写缓冲上限，drain 及时施加背压，每个任务只缓存少量音频数据
+_WRITE_BUFFER_HIGH = 64 * 1024
+_WRITE_BUFFER_LOW = 16 * 1024
+
+
+class FFmpegError(RuntimeError):
+    """ffmpeg 编码失败 (非零退出码)"""
+
+
+async def edge_tts_audio(communicate) -> AsyncIterator[bytes]:
+    """只取 edge_tts.Communicate 流中的音频数据块"""
+    async for chunk in communicate.stream():
+        if chunk["type"] == "audio":
+            yield chunk["data"]
+
+
+async def stream_mp3_to_opus(audio_iter: AsyncIterator[bytes], output_path: Path, opus_args: Sequence[str] = SEGMENT_OPUS_ARGS):
+    """把 MP3 数据块写入 ffmpeg stdin 编码为 opus，失败时抛出 FFmpegError"""
+    # edge-tts 固定输出 MP3，显式 -f mp3 免去格式探测；-loglevel error 避免 stderr 管道写满卡住 ffmpeg
+    proc = await asyncio.create_subprocess_exec(
+        "ffmpeg", "-hide_banner", "-loglevel", "error",
+        "-f", "mp3", "-i", "pipe:0", *opus_args, "-y", str(output_path),
+        stdin=asyncio.subprocess.PIPE,
+        stdout=asyncio.subprocess.DEVNULL,
+        stderr=asyncio.subprocess.PIPE
+    )
+    proc.stdin.transport.set_write_buffer_limits(high=_WRITE_BUFFER_HIGH, low=_WRITE_BUFFER_LOW)
+    try:
+        async for data in audio_iter:
+            proc.stdin.write(data)
+            await proc.stdin.drain()
+        # communicate() 不带 input 时不会关闭 stdin，必须先关闭，ffmpeg 读到 EOF 才会结束编码
+        proc.stdin.close()
+        _, stderr = await proc.communicate()
+    except BaseException:
+        # 先关闭音频流 (长连接会话据此丢弃未读完的 websocket)，再结束 ffmpeg，避免遗留进程
+        aclose = getattr(audio_iter, "aclose", None)
+        if aclose is not None:
+            await aclose()
+        if proc.returncode is None:
+            proc.kill()
+            await proc.wait()
+        raise
+    
+    if proc.returncode != 0:
+        # 异常信息只取 stderr 末尾 2KB
+        raise FFmpegError(f"ffmpeg 退出码 {proc.returncode}: {stderr[-2048:].decode(errors='ignore').strip()}")
@@ -0,0 +1,465 @@
+"""
+实验性 TTS 修复脚本的公共组件
+"""
+
+import asyncio
+import hashlib
+import io
+import json
+import os
+import random
+import re
+import tempfile
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import List, Optional, Tuple
+from uuid import UUID
+
+import aiohttp
+import edge_tts
+from edge_tts.exceptions import NoAudioReceived, UnexpectedResponse, WebSocketError
+from sqlalchemy import text as sql_text
+
+from app.db.session import SessionLocal
+from scripts.tts._markdown_cleaner import clean_markdown_for_tts
+from scripts.tts._opus_stream import SEGMENT_OPUS_ARGS, edge_tts_audio, stream_mp3_to_opus
+
+try:
+    import av
+    AV_AVAILABLE = True
+except ImportError:
+    AV_AVAILABLE = False
+
+DEFAULT_VOICE = "zh-CN-XiaoxiaoNeural"
+TARGET_SEGMENTS = 6
+# 片段序号 -> 期望的音频文件名，模块加载时生成一次
+EXPECTED_SEGMENT_FILES = {i: f"segment_{i:02d}_part_{i+1}.opus" for i in range(TARGET_SEGMENTS)}
+# 论文目录中的分段缓存文件
+SEGMENT_CACHE_NAME = ".segments.json"
+
+# Opus 输出参数，与 ffmpeg 命令行 -ar 24000 -b:a 20k -application voip 一致
+OPUS_SAMPLE_RATE = 24000
+OPUS_BIT_RATE = 20000
+FFMPEG_OPUS_ARGS = SEGMENT_OPUS_ARGS
+
+# 可重试的瞬时错误：Edge-TTS 无音频/连接断开、网络超时
+TRANSIENT_ERRORS = (
+    NoAudioReceived,
+    UnexpectedResponse,
+    WebSocketError,
+    aiohttp.ClientError,
+    asyncio.TimeoutError,
+    ConnectionError,
+)
+
+
+class AsyncRateLimiter:
+    """异步限速器：所有协程共享，保证相邻两次请求的间隔不小于 1/rps"""
+
+    def __init__(self, rps: float):
+        self.interval = 1.0 / rps
+        self._last_ts = 0.0
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        """等待到下一个可用的请求时间点"""
+        async with self._lock:
+            sleep_for = self.interval - (time.monotonic() - self._last_ts)
+            if sleep_for > 0:
+                await asyncio.sleep(sleep_for)
+            self._last_ts = time.monotonic()
+
+
+# 分句：两个句末标点之间的内容
+_RE_SENTENCE = re.compile(r'[^。！？]+')
+
+
+def is_nonempty_file(path) -> bool:
+    """文件存在且非空 (只做一次 stat 系统调用)"""
+    try:
+        return os.stat(path).st_size > 0
+    except FileNotFoundError:
+        return False
+
+
+def is_transient(error: Exception) -> bool:
+    """判断错误是否值得重试 (ffmpeg 缺失、编码失败等永久错误不重试)"""
+    if isinstance(error, TRANSIENT_ERRORS):
+        return True
+    message = str(error).lower()
+    return "429" in message or "rate" in message
+
+
+def backoff_delay(attempt: int, base: float = 1.0, cap: float = 16.0) -> float:
+    """指数退避等待时间 (带随机抖动)"""
+    return min(cap, base * 2 ** attempt) + random.uniform(0, 0.5)
+
+
+def encode_mp3_to_opus(mp3_bytes: bytes, output_path: Path):
+    """用 PyAV (libavcodec) 在进程内把 MP3 数据编码为 opus 文件"""
+    resampler = av.AudioResampler(format='s16', layout='mono', rate=OPUS_SAMPLE_RATE)
+    with av.open(io.BytesIO(mp3_bytes), 'r') as src, av.open(str(output_path), 'w', format='opus') as dst:
+        stream = dst.add_stream('libopus', rate=OPUS_SAMPLE_RATE, options={'application': 'voip'})
+        stream.codec_context.layout = 'mono'
+        stream.codec_context.bit_rate = OPUS_BIT_RATE
+        
+        for frame in src.decode(audio=0):
+            for resampled in resampler.resample(frame):
+                dst.mux(stream.encode(resampled))
+        # 冲刷重采样器和编码器中的剩余数据
+        for resampled in resampler.resample(None):
+            dst.mux(stream.encode(resampled))
+        dst.mux(stream.encode(None))
+
+
+async def synthesize_opus_in_process(communicate: edge_tts.Communicate, output_path: Path):
+    """收集 Edge-TTS 音频流并在进程内编码为 opus，不写临时文件、不启动 ffmpeg"""
+    audio = bytearray()
+    async for data in edge_tts_audio(communicate):
+        audio.extend(data)
+    await asyncio.to_thread(encode_mp3_to_opus, bytes(audio), output_path)
+
+
+async def terminate_process(proc: asyncio.subprocess.Process):
+    """结束仍在运行的 ffmpeg 子进程并等待回收，避免取消时遗留僵尸进程"""
+    if proc.returncode is None:
+        proc.terminate()
+        await proc.wait()
+
+
+def scan_incomplete_papers(tts_dir: Path) -> List[Tuple[UUID, List[int]]]:
+    """一次 scandir 扫描所有论文目录，返回缺失片段的论文及缺失片段序号"""
+    incomplete_papers = []
+    
+    with os.scandir(tts_dir) as entries:
+        for entry in entries:
+            # 先做廉价的 UUID 形状检查，入选后再解析
+            if len(entry.name) != 36 or entry.name.count('-') != 4 or not entry.is_dir():
+                continue
+            
+            # 每个论文目录只做一次 scandir，文件是否存在改为集合查找
+            with os.scandir(entry.path) as files:
+                opus_names = {f.name for f in files if f.name.endswith('.opus')}
+            if len(opus_names) >= TARGET_SEGMENTS:
+                continue
+            
+            missing_segments = [
+                i for i, name in EXPECTED_SEGMENT_FILES.items() if name not in opus_names
+            ]
+            if not missing_segments:
+                continue
+            
+            try:
+                incomplete_papers.append((UUID(entry.name), missing_segments))
+            except ValueError:
+                continue
+    
+    return incomplete_papers
+
+
+async def convert_wav_to_opus(wav_path: Path) -> bool:
+    """异步转换WAV为OPUS，成功后删除WAV (不阻塞事件循环)"""
+    # 旧版脚本把 Edge-TTS 的 MP3 数据存成了 .wav 后缀，这里不指定输入格式，由 ffmpeg 按内容探测
+    try:
+        proc = await asyncio.create_subprocess_exec(
+            "ffmpeg", "-hide_banner", "-loglevel", "error",
+            "-i", str(wav_path), *FFMPEG_OPUS_ARGS, "-y", str(wav_path.with_suffix('.opus')),
+            stdout=asyncio.subprocess.DEVNULL,
+            stderr=asyncio.subprocess.DEVNULL
+        )
+        try:
+            await proc.wait()
+        except asyncio.CancelledError:
+            await terminate_process(proc)
+            raise
+        if proc.returncode != 0:
+            raise RuntimeError(f"ffmpeg 退出码 {proc.returncode}")
+        wav_path.unlink(missing_ok=True)
+        return True
+    except Exception as e:
+        print(f"❌ 转换失败 {wav_path}: {e}")
+        return False
+
+
+async def convert_wav_group(wav_paths: List[Path]) -> bool:
+    """一次 ffmpeg 调用转换同一目录下的多个WAV (多路输入各自映射到对应输出)"""
+    cmd = ["ffmpeg", "-hide_banner", "-loglevel", "error", "-y"]
+    for wav_path in wav_paths:
+        cmd += ["-i", str(wav_path)]
+    for k, wav_path in enumerate(wav_paths):
+        cmd += ["-map", f"{k}:a:0", *FFMPEG_OPUS_ARGS, str(wav_path.with_suffix('.opus'))]
+    
+    try:
+        proc = await asyncio.create_subprocess_exec(
+            *cmd,
+            stdout=asyncio.subprocess.DEVNULL,
+            stderr=asyncio.subprocess.DEVNULL
+        )
+    except OSError:
+        return False
+    
+    try:
+        await proc.wait()
+    except asyncio.CancelledError:
+        await terminate_process(proc)
+        raise
+    if proc.returncode != 0:
+        return False
+    
+    for wav_path in wav_paths:
+        wav_path.unlink(missing_ok=True)
+    return True
+
+
+async def convert_wav_files(wav_files: list) -> int:
+    """按目录分组并发转换WAV文件 (并发数 = CPU 核数)，返回成功数量"""
+    semaphore = asyncio.Semaphore(os.cpu_count() or 4)
+    
+    groups = defaultdict(list)
+    for wav_path in wav_files:
+        groups[wav_path.parent].append(wav_path)
+    
+    converted = 0
+    
+    async def convert(wav_paths: List[Path]):
+        nonlocal converted
+        async with semaphore:
+            # 多个文件合并为一次 ffmpeg 调用；失败时逐个转换，定位具体出错的文件
+            if len(wav_paths) > 1 and await convert_wav_group(wav_paths):
+                results = [True] * len(wav_paths)
+            else:
+                results = [await convert_wav_to_opus(w) for w in wav_paths]
+        for wav_path, ok in zip(wav_paths, results):
+            if ok:
+                print(f"✅ 转换: {wav_path.name}")
+        converted += sum(results)
+    
+    # TaskGroup: 中断时取消所有转换任务，并由各任务结束自己的 ffmpeg 进程
+    async with asyncio.TaskGroup() as tg:
+        for paths in groups.values():
+            tg.create_task(convert(paths))
+    return converted
+
+
+def _iter_sentences(content: str):
+    """按 。！？ 流式切分句子 (去除首尾空白，跳过空句)"""
+    for match in _RE_SENTENCE.finditer(content):
+        sentence = match.group().strip()
+        if sentence:
+            yield sentence
+
+
+def segment_interpretation(content: str, target_segments: int = TARGET_SEGMENTS) -> List[Tuple[str, str]]:
+    """将内容分割为6个片段"""
+    segments = []
+    content = content.strip()
+    
+    # 第一遍只计数，第二遍按目标句数直接装入片段，不保存完整的句子列表
+    n_sentences = sum(1 for _ in _iter_sentences(content))
+    
+    if n_sentences <= target_segments:
+        for i, sentence in enumerate(_iter_sentences(content)):
+            segments.append((f'part_{i+1}', sentence + '。'))
+    else:
+        sentences_per_segment, remainder = divmod(n_sentences, target_segments)
+        
+        current = []
+        for sentence in _iter_sentences(content):
+            current.append(sentence)
+            segment_size = sentences_per_segment + (1 if len(segments) < remainder else 0)
+            if len(current) == segment_size:
+                segments.append((f'part_{len(segments)+1}', '。'.join(current) + '。'))
+                current = []
+    
+    while len(segments) < target_segments:
+        segments.append((f'part_{len(segments)+1}', ''))
+    
+    return segments[:target_segments]
+
+
+def load_or_segment(paper_dir: Path, full_content: str) -> List[Tuple[str, str]]:
+    """分段结果按内容哈希缓存在论文目录中，修复脚本重复运行时跳过分段"""
+    content_hash = hashlib.blake2b(full_content.encode('utf-8')).hexdigest()
+    cache_path = paper_dir / SEGMENT_CACHE_NAME
+    
+    try:
+        cached = json.loads(cache_path.read_text(encoding='utf-8'))
+        if cached.get('content_hash') == content_hash:
+            return [(seg['type'], seg['text']) for seg in cached['segments']]
+    except (OSError, ValueError, KeyError, TypeError):
+        pass
+    
+    segments = segment_interpretation(full_content)
+    payload = json.dumps({
+        'content_hash': content_hash,
+        'segments': [{'type': seg_type, 'text': seg_text} for seg_type, seg_text in segments]
+    }, ensure_ascii=False)
+    
+    # mkstemp 在同目录原子创建临时文件，写完再 os.replace，中途崩溃不会留下半个缓存
+    tmp_path = None
+    try:
+        fd, tmp_name = tempfile.mkstemp(suffix='.tmp', prefix='.segments_', dir=str(paper_dir))
+        tmp_path = Path(tmp_name)
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(payload)
+        os.replace(tmp_path, cache_path)
+    except OSError as e:
+        print(f"⚠️ 写入分段缓存失败 {cache_path}: {e}")
+    finally:
+        if tmp_path is not None:
+            tmp_path.unlink(missing_ok=True)
+    return segments
+
+
+_PAPER_ROWS_SQL = sql_text("""
+    SELECT 
+        p.id,
+        p.title,
+        COALESCE(pt.title_zh, p.title) as title_zh,
+        pi.interpretation
+    FROM papers p
+    LEFT JOIN paper_translations pt ON p.id = pt.paper_id
+    LEFT JOIN paper_interpretations pi ON p.id = pi.paper_id
+    WHERE p.id = ANY(CAST(:paper_ids AS uuid[]))
+    AND pi.interpretation IS NOT NULL
+""")
+
+
+def fetch_paper_rows(paper_ids: List[UUID]) -> dict:
+    """一次查询批量获取论文标题和AI解读"""
+    db = SessionLocal()
+    try:
+        # 直接传 UUID 列表，由服务端统一转换为 uuid[] 比较，避免 uuid = text 的类型不匹配
+        result = db.execute(_PAPER_ROWS_SQL, {"paper_ids": list(paper_ids)})
+        return {
+            row.id: {
+                'title_en': row.title,
+                'title_zh': row.title_zh,
+                'interpretation': row.interpretation
+            }
+            for row in result
+        }
+    finally:
+        db.close()
+
+
+async def generate_segment_tts(
+    text: str,
+    output_path: Path,
+    limiter: AsyncRateLimiter,
+    voice: str = DEFAULT_VOICE,
+    max_retries: int = 2,
+    retry_base: float = 1.0,
+    max_chars: Optional[int] = None
+) -> bool:
+    """生成单个片段的TTS音频，瞬时错误指数退避重试 (文本需已清理 markdown)"""
+    # 空片段 (分段补齐的占位) 直接返回，不占用限速配额
+    if not text.strip():
+        return False
+    
+    for attempt in range(max_retries):
+        try:
+            # 全局限速，重试同样经过限速器
+            await limiter.acquire()
+            
+            clean_text = text
+            if max_chars and len(clean_text) > max_chars:  # 限制文本长度
+                clean_text = clean_text[:max_chars] + "..."
+            
+            communicate = edge_tts.Communicate(clean_text, voice)
+            
+            if AV_AVAILABLE:
+                # 安装了 PyAV 时在进程内编码，跳过 ffmpeg 进程
+                await synthesize_opus_in_process(communicate, output_path)
+            else:
+                # 音频流直接写入 ffmpeg stdin，不落临时文件
+                await stream_mp3_to_opus(edge_tts_audio(communicate), output_path, FFMPEG_OPUS_ARGS)
+            
+            # 检查输出文件，空文件按瞬时错误重试
+            if is_nonempty_file(output_path):
+                return True
+            raise NoAudioReceived("生成的音频为空")
+            
+        except Exception as e:
+            # 永久错误 (如 ffmpeg 不存在) 不再重试
+            if not is_transient(e) or attempt == max_retries - 1:
+                print(f"    ❌ 生成失败 {output_path.name}: {e}")
+                return False
+            print(f"    ⚠️ 尝试 {attempt+1} 失败，退避重试: {e}")
+            await asyncio.sleep(backoff_delay(attempt, base=retry_base))
+    
+    return False
+
+
+async def run_fix(
+    tts_dir: Path,
+    rps: float,
+    concurrency: int,
+    max_retries: int = 2,
+    retry_base: float = 1.0,
+    max_chars: Optional[int] = None,
+    max_papers: Optional[int] = None
+) -> dict:
+    """扫描不完整论文，并发补全缺失片段；各脚本只需设定限速、并发与重试策略"""
+    # 目录扫描和数据库查询都是阻塞调用，放到线程中执行，不阻塞事件循环
+    incomplete_papers = await asyncio.to_thread(scan_incomplete_papers, tts_dir)
+    stats = {'incomplete': len(incomplete_papers), 'papers': 0, 'generated': 0}
+    print(f"📊 发现 {len(incomplete_papers)} 篇不完整论文")
+    
+    if not incomplete_papers:
+        print("✅ 所有论文都已完整")
+        return stats
+    
+    if max_papers:
+        print(f"只处理前 {max_papers} 篇")
+        incomplete_papers = incomplete_papers[:max_papers]
+    stats['papers'] = len(incomplete_papers)
+    
+    paper_data = await asyncio.to_thread(fetch_paper_rows, [pid for pid, _ in incomplete_papers])
+    
+    limiter = AsyncRateLimiter(rps)
+    semaphore = asyncio.Semaphore(concurrency)
+    
+    async def generate(text: str, output_path: Path, label: str):
+        # generate_segment_tts 内部处理普通异常，这里只会向上传播取消
+        async with semaphore:
+            ok = await generate_segment_tts(
+                text, output_path, limiter,
+                max_retries=max_retries, retry_base=retry_base, max_chars=max_chars
+            )
+        if ok:
+            stats['generated'] += 1
+            print(f"    ✅ {label}")
+    
+    jobs = []
+    for i, (paper_id, missing_segments) in enumerate(incomplete_papers):
+        data = paper_data.get(paper_id)
+        if not data:
+            print(f"❌ 论文 {paper_id} 没有AI解读")
+            continue
+        
+        print(f"🎵 [{i+1}/{len(incomplete_papers)}] 排队: {paper_id} (缺失 {len(missing_segments)} 个片段)")
+        
+        # 解读先整体清理 markdown 再分段，每篇只清理一次，分句也不受 markdown 符号干扰
+        full_content = f"论文标题：{data['title_zh']}\n英文标题：{data['title_en']}\nAI解读：{clean_markdown_for_tts(data['interpretation'])}"
+        paper_dir = tts_dir / str(paper_id)
+        segments = load_or_segment(paper_dir, full_content)
+        
+        for segment_idx in missing_segments:
+            if segment_idx < len(segments):
+                segment_type, segment_text = segments[segment_idx]
+                if not segment_text.strip():
+                    continue
+                segment_file = paper_dir / f"segment_{segment_idx:02d}_{segment_type}.opus"
+                jobs.append((
+                    segment_text, segment_file,
+                    f"{paper_id} 片段 {segment_idx+1} ({len(segment_text)} 字符)"
+                ))
+    
+    print(f"\n🔄 并发生成 {len(jobs)} 个片段 (并发数 {concurrency}, 限速 {rps}/秒)")
+    # TaskGroup 结构化并发：Ctrl-C 时取消全部任务，合成中的 ffmpeg 进程随之结束
+    async with asyncio.TaskGroup() as tg:
+        for job in jobs:
+            tg.create_task(generate(*job))
+    return stats
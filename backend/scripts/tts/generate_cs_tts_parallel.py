@@ -5,58 +5,200 @@ CS候选池TTS生成 - 支持分片并发处理
 """
 import asyncio
 import argparse
+import os
 import sys
 import random
-import uuid
-import subprocess
-import re
+from contextvars import ContextVar
 from pathlib import Path
+from typing import AsyncIterator, Optional
 from uuid import UUID
 from datetime import datetime
+from xml.sax.saxutils import escape
 
 backend_root = Path(__file__).parent.parent.parent
 sys.path.insert(0, str(backend_root))
 
+import aiohttp
 import edge_tts
+from edge_tts.exceptions import NoAudioReceived, WebSocketError
 import pendulum
 from sqlalchemy.orm import Session
-from sqlalchemy import text
+from sqlalchemy import bindparam, insert, select, text
+from sqlalchemy.dialects.postgresql import ARRAY, UUID as PG_UUID
 from app.db.session import SessionLocal
 from app.services.data_ingestion.arxiv_candidate_pool import CandidatePoolServiceV2
 from app.models.paper_tts import PaperTTS
+from scripts.tts._markdown_cleaner import clean_markdown_for_tts
+from scripts.tts._opus_stream import FFmpegError, edge_tts_audio, stream_mp3_to_opus
 
-def clean_markdown_for_tts(text: str) -> str:
-    """清理markdown语法，优化TTS朗读"""
-    if not text:
-        return text
+from tenacity import retry, stop_after_attempt, wait_exponential
+
+# 长连接会话依赖 edge-tts 的内部协议函数，版本不兼容时退回每段新建 Communicate
+try:
+    from edge_tts.communicate import (
+        _SSL_CTX,
+        connect_id,
+        date_to_string,
+        get_headers_and_data,
+        mkssml,
+        remove_incompatible_characters,
+        split_text_by_byte_length,
+        ssml_headers_plus_data,
+    )
+    from edge_tts.constants import SEC_MS_GEC_VERSION, WSS_HEADERS, WSS_URL
+    from edge_tts.data_classes import TTSConfig
+    from edge_tts.drm import DRM
+    EDGE_TTS_SESSION_AVAILABLE = True
+except ImportError:
+    EDGE_TTS_SESSION_AVAILABLE = False
+
+
+class SharedTCPConnector(aiohttp.TCPConnector):
+    """
+    批次内共享的连接器
+    
+    edge-tts 每次合成都新建 ClientSession，退出时会关闭传入的 connector；
+    这里忽略这些关闭，DNS 缓存与连接上限在整个批次内生效，批次结束后调用 shutdown() 统一关闭。
+    """
+    
+    async def close(self, *args, **kwargs):
+        return None
+    
+    async def shutdown(self):
+        await super().close()
+
+
+# 当前批次的共享连接器，经 contextvar 传给 generate_single_tts，不改变其签名
+_tts_connector: ContextVar[Optional[aiohttp.BaseConnector]] = ContextVar('_tts_connector', default=None)
+
+
+class EdgeTTSSession:
+    """
+    长连接的 edge-tts 会话
+    
+    每个 worker 持有一条 websocket，依次发送多段 SSML 请求，省去每段的握手与鉴权；
+    出错时关闭连接并标记 broken，该段的重试改走 Communicate，之后的合成自动重连。
+    """
     
-    if text.strip().startswith('```json'):
+    def __init__(self, voice: str, connector: Optional[aiohttp.BaseConnector] = None):
+        self.voice = voice
+        self.tts_config = TTSConfig(voice, "+0%", "+0%", "+0Hz", "SentenceBoundary")
+        self.connector = connector
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._ws: Optional[aiohttp.ClientWebSocketResponse] = None
+        self.broken = False
+    
+    async def _connect(self) -> aiohttp.ClientWebSocketResponse:
+        if self._ws is not None and not self._ws.closed:
+            return self._ws
+        
+        if self._session is None:
+            self._session = aiohttp.ClientSession(
+                connector=self.connector,
+                connector_owner=False,
+                trust_env=True,
+                timeout=aiohttp.ClientTimeout(total=None, sock_connect=10, sock_read=60),
+            )
+        
+        for attempt in range(2):
+            try:
+                self._ws = await self._session.ws_connect(
+                    f"{WSS_URL}&ConnectionId={connect_id()}"
+                    f"&Sec-MS-GEC={DRM.generate_sec_ms_gec()}"
+                    f"&Sec-MS-GEC-Version={SEC_MS_GEC_VERSION}",
+                    compress=15,
+                    headers=DRM.headers_with_muid(WSS_HEADERS),
+                    ssl=_SSL_CTX,
+                )
+                return self._ws
+            except aiohttp.ClientResponseError as e:
+                # 403 通常是本地时钟偏差导致鉴权失败，校正后重试一次 (与 Communicate 一致)
+                if e.status != 403 or attempt:
+                    raise
+                DRM.handle_client_response_error(e)
+    
+    async def _send_request(self, ws: aiohttp.ClientWebSocketResponse, partial_text: bytes):
+        await ws.send_str(
+            f"X-Timestamp:{date_to_string()}\r\n"
+            "Content-Type:application/json; charset=utf-8\r\n"
+            "Path:speech.config\r\n\r\n"
+            '{"context":{"synthesis":{"audio":{"metadataoptions":{'
+            '"sentenceBoundaryEnabled":"true","wordBoundaryEnabled":"false"'
+            "},"
+            '"outputFormat":"audio-24khz-48kbitrate-mono-mp3"'
+            "}}}}\r\n"
+        )
+        await ws.send_str(
+            ssml_headers_plus_data(connect_id(), date_to_string(), mkssml(self.tts_config, partial_text))
+        )
+    
+    async def stream_audio(self, text: str) -> AsyncIterator[bytes]:
+        """合成一段文本，逐块产出 MP3 音频数据"""
+        audio_was_received = False
         try:
-            import json
-            json_match = re.search(r'```json\s*(\[.*?\])\s*```', text, re.DOTALL)
-            if json_match:
-                json_data = json.loads(json_match.group(1))
-                content_parts = []
-                for item in json_data:
-                    if isinstance(item, dict) and 'zh' in item:
-                        content_parts.append(item['zh'])
-                text = '\n\n'.join(content_parts)
-        except:
-            pass
-    
-    text = re.sub(r'```[^`]*```', '', text)
-    text = re.sub(r'`([^`]+)`', r'\1', text)
-    text = re.sub(r'\*\*([^*]+)\*\*', r'\1', text)
-    text = re.sub(r'\*([^*]+)\*', r'\1', text)
-    text = re.sub(r'#{1,6}\s*', '', text)
-    text = re.sub(r'\[([^\]]+)\]\([^)]+\)', r'\1', text)
-    text = re.sub(r'^\s*[-*+]\s+', '', text, flags=re.MULTILINE)
-    text = re.sub(r'^\s*\d+\.\s+', '', text, flags=re.MULTILINE)
-    text = re.sub(r'\n{3,}', '\n\n', text)
-    
-    return text.strip()
+            ws = await self._connect()
+            for partial_text in split_text_by_byte_length(escape(remove_incompatible_characters(text)), 4096):
+                await self._send_request(ws, partial_text)
+                
+                # 读到 turn.end 为止，连接保留给下一段
+                while True:
+                    msg = await ws.receive()
+                    if msg.type == aiohttp.WSMsgType.TEXT:
+                        encoded = msg.data.encode("utf-8")
+                        headers, _ = get_headers_and_data(encoded, encoded.find(b"\r\n\r\n"))
+                        if headers.get(b"Path") == b"turn.end":
+                            break
+                    elif msg.type == aiohttp.WSMsgType.BINARY:
+                        if len(msg.data) < 2:
+                            continue
+                        header_length = int.from_bytes(msg.data[:2], "big")
+                        headers, data = get_headers_and_data(msg.data, header_length)
+                        if headers.get(b"Path") == b"audio" and data:
+                            audio_was_received = True
+                            yield data
+                    else:
+                        raise WebSocketError(f"websocket 意外关闭: {msg.type}")
+        except BaseException:
+            # 连接状态未知，丢弃后下次重连
+            self.broken = True
+            await self._close_ws()
+            raise
+        
+        if not audio_was_received:
+            raise NoAudioReceived("未收到音频数据")
+    
+    async def _close_ws(self):
+        if self._ws is not None:
+            await self._ws.close()
+            self._ws = None
+    
+    async def close(self):
+        await self._close_ws()
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+
+# 当前 worker 的长连接会话，经 contextvar 传给 generate_single_tts
+_tts_session: ContextVar[Optional[EdgeTTSSession]] = ContextVar('_tts_session', default=None)
+
+def disable_edge_tts_session(reason):
+    """长连接会话与已安装的 edge-tts 内部接口不兼容时，本进程内全部改用 Communicate"""
+    global EDGE_TTS_SESSION_AVAILABLE
+    if EDGE_TTS_SESSION_AVAILABLE:
+        EDGE_TTS_SESSION_AVAILABLE = False
+        print(f"⚠️  edge-tts 长连接会话不可用，改用 Communicate: {reason!r}")
+
+# 整篇朗读的 opus 参数：朗读语音用 voip 模式；compression_level 8 编码耗时明显低于 10，体积几乎不变
+CS_OPUS_ARGS = (
+    '-c:a', 'libopus',
+    '-b:a', '24k',
+    '-vbr', 'on',
+    '-application', 'voip',
+    '-compression_level', '8',
+    '-frame_duration', '60',
+)
 
-from tenacity import retry, stop_after_attempt, wait_exponential
 
 @retry(
     stop=stop_after_attempt(3),
@@ -68,35 +210,40 @@ async def generate_single_tts(paper_id: str, content: str, voice: str, output_pa
     try:
         await asyncio.sleep(random.uniform(0.1, 0.3))
         
-        clean_content = clean_markdown_for_tts(content)
+        # 长解读的正则清理放到线程中执行，不阻塞其他任务的网络读写
+        clean_content = await asyncio.to_thread(clean_markdown_for_tts, content)
         
         if len(clean_content) < 10:
             print(f"❌ 内容过短: {paper_id}")
             return False
         
-        communicate = edge_tts.Communicate(clean_content, voice)
-        temp_wav = output_path.parent / f"temp_{uuid.uuid4().hex[:8]}.wav"
-        
-        await communicate.save(str(temp_wav))
-        
-        cmd = [
-            'ffmpeg', '-i', str(temp_wav),
-            '-c:a', 'libopus',
-            '-b:a', '24k',
-            '-vbr', 'on',
-            '-compression_level', '10',
-            '-frame_duration', '60',
-            '-y', str(output_path)
-        ]
-        
-        result = subprocess.run(cmd, capture_output=True, text=True)
-        
-        if temp_wav.exists():
-            temp_wav.unlink()
+        session = _tts_session.get()
+        use_session = (
+            EDGE_TTS_SESSION_AVAILABLE and session is not None
+            and session.voice == voice and not session.broken
+        )
+        if use_session:
+            # worker 的长连接会话：多篇论文复用同一条 websocket
+            audio_stream = session.stream_audio(clean_content)
+        else:
+            # 会话刚出错时本次改用 Communicate，下一篇再尝试长连接
+            if session is not None:
+                session.broken = False
+            audio_stream = edge_tts_audio(
+                edge_tts.Communicate(clean_content, voice, connector=_tts_connector.get())
+            )
         
-        if result.returncode != 0:
-            print(f"❌ FFmpeg转换失败: {paper_id}")
+        # edge-tts 输出 MP3 流，直接写入 ffmpeg stdin 编码为 opus，不落临时文件
+        try:
+            await stream_mp3_to_opus(audio_stream, output_path, CS_OPUS_ARGS)
+        except FFmpegError as e:
+            print(f"❌ FFmpeg转换失败: {paper_id}: {e}")
             return False
+        except (TypeError, AttributeError) as e:
+            # 会话依赖 edge-tts 私有接口，版本不符时表现为这类异常而非网络错误；停用会话，重试走 Communicate
+            if use_session:
+                disable_edge_tts_session(e)
+            raise
         
         if output_path.exists() and output_path.stat().st_size > 1000:
             file_size = output_path.stat().st_size / 1024
@@ -110,28 +257,85 @@ async def generate_single_tts(paper_id: str, content: str, voice: str, output_pa
         print(f"❌ TTS生成失败 {paper_id}: {e}")
         raise  # Re-raise for tenacity to catch and retry
 
+def scan_opus_sizes(output_dir: Path, paper_ids) -> dict:
+    """一次 scandir 遍历输出目录，返回本批论文已有 opus 文件的大小 (只对本批文件 stat)"""
+    wanted = {f"{paper_id}.opus": paper_id for paper_id in paper_ids}
+    sizes = {}
+    with os.scandir(output_dir) as entries:
+        for entry in entries:
+            paper_id = wanted.get(entry.name)
+            if paper_id is not None:
+                sizes[paper_id] = entry.stat().st_size
+    return sizes
+
 async def process_batch(papers, voice, output_dir, concurrency):
     """处理一批论文"""
-    semaphore = asyncio.Semaphore(concurrency)
+    # 跳过判断用一次目录扫描的结果，不再逐篇 exists/stat
+    existing_sizes = scan_opus_sizes(output_dir, [paper[0] for paper in papers])
+    
+    # 固定数量的 worker 从队列取论文，同一时刻只有 concurrency 篇的完整朗读文本驻留内存
+    queue = asyncio.Queue()
+    for paper in papers:
+        queue.put_nowait(paper)
+    results = []
     
-    async def process_single(paper):
-        async with semaphore:
-            paper_id, title_en, title_zh, interpretation = paper
+    async def worker():
+        # 每个 worker 一条 websocket 长连接；contextvar 只在本 worker 的任务内生效
+        session = None
+        if EDGE_TTS_SESSION_AVAILABLE:
+            try:
+                session = EdgeTTSSession(voice, _tts_connector.get())
+            except Exception as e:
+                # 构造失败 (如 TTSConfig 签名变化) 不应让 gather 整体失败，退回 Communicate
+                disable_edge_tts_session(e)
+        _tts_session.set(session)
+        try:
+            await process_queue()
+        finally:
+            if session is not None:
+                await session.close()
+    
+    async def process_queue():
+        while True:
+            try:
+                paper_id, title_en, title_zh, interpretation = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
             
             output_path = output_dir / f"{paper_id}.opus"
-            if output_path.exists() and output_path.stat().st_size > 1000:
+            if existing_sizes.get(paper_id, 0) > 1000:
                 print(f"⏭️  跳过已存在: {paper_id}")
-                return paper_id, True
+                results.append((paper_id, True))
+                continue
             
             full_content = f"论文标题：{title_zh}\n英文标题：{title_en}\nAI解读：{interpretation}"
-            success = await generate_single_tts(str(paper_id), full_content, voice, output_path)
-            return paper_id, success
+            try:
+                success = await generate_single_tts(str(paper_id), full_content, voice, output_path)
+            except Exception:
+                # 重试耗尽，记为失败，worker 继续处理下一篇
+                success = False
+            results.append((paper_id, success))
     
-    tasks = [process_single(paper) for paper in papers]
-    results = await asyncio.gather(*tasks, return_exceptions=True)
+    await asyncio.gather(*(worker() for _ in range(min(concurrency, len(papers)))))
     
     return results
 
+_CS_PAPERS_SQL = text("""
+    SELECT 
+        p.id,
+        p.title,
+        COALESCE(pt.title_zh, p.title) as title_zh,
+        pi.interpretation
+    FROM papers p
+    LEFT JOIN paper_translations pt ON p.id = pt.paper_id
+    LEFT JOIN paper_interpretations pi ON p.id = pi.paper_id
+    WHERE p.id = ANY(:paper_ids)
+    AND pi.interpretation IS NOT NULL
+""").bindparams(
+    # 声明为 uuid[]，psycopg 直接发送类型化数组；语句文本固定，可复用服务端预编译计划
+    bindparam("paper_ids", type_=ARRAY(PG_UUID(as_uuid=True)))
+)
+
 def get_cs_papers_batch(db, offset, limit, target_date):
     """获取CS候选池论文的指定范围"""
     # 获取CS候选池所有论文ID
@@ -147,47 +351,48 @@ def get_cs_papers_batch(db, offset, limit, target_date):
     if not batch_ids:
         return []
     
-    # 获取论文内容
+    # 一次查询取回整批论文内容，避免每篇三次往返 (候选池返回的已是 uuid.UUID)
+    rows = db.execute(_CS_PAPERS_SQL, {"paper_ids": batch_ids}).mappings()
+    by_id = {row["id"]: row for row in rows}
+    
+    # 保持候选池中的原始顺序
     papers = []
     for paper_id in batch_ids:
-        paper = db.execute(
-            text("SELECT title FROM papers WHERE id = :paper_id"),
-            {"paper_id": paper_id}
-        ).fetchone()
-        
-        translation = db.execute(
-            text("SELECT title_zh FROM paper_translations WHERE paper_id = :paper_id"),
-            {"paper_id": paper_id}
-        ).fetchone()
-        
-        interpretation = db.execute(
-            text("SELECT interpretation FROM paper_interpretations WHERE paper_id = :paper_id"),
-            {"paper_id": paper_id}
-        ).fetchone()
-        
-        if paper and translation and interpretation:
-            papers.append((paper_id, paper[0], translation[0], interpretation[0]))
+        row = by_id.get(paper_id)
+        if row:
+            papers.append((paper_id, row["title"], row["title_zh"], row["interpretation"]))
     
     return papers
 
 def save_tts_records(db, results, output_dir):
     """保存TTS记录到数据库"""
-    for paper_id, success in results:
-        if success and isinstance(paper_id, UUID):
-            output_path = output_dir / f"{paper_id}.opus"
-            if output_path.exists():
-                file_size = output_path.stat().st_size
-                
-                existing = db.query(PaperTTS).filter(PaperTTS.paper_id == paper_id).first()
-                if not existing:
-                    tts_record = PaperTTS(
-                        paper_id=paper_id,
-                        file_path=f"{paper_id}.opus",
-                        file_size=file_size,
-                        voice_model="zh-CN-XiaoxiaoNeural",
-                        generated_at=datetime.utcnow()
-                    )
-                    db.add(tts_record)
+    # 生成结束后再扫描一次目录取得文件大小，文件不存在则跳过
+    success_ids = [paper_id for paper_id, success in results if success and isinstance(paper_id, UUID)]
+    file_sizes = scan_opus_sizes(output_dir, success_ids)
+    
+    if not file_sizes:
+        return
+    
+    # paper_tts.paper_id 不唯一 (同一论文可有多种语音)，无法 ON CONFLICT，
+    # 这里用一次查询取出已有记录，再批量插入其余记录
+    existing = set(db.execute(
+        select(PaperTTS.paper_id).where(PaperTTS.paper_id.in_(list(file_sizes)))
+    ).scalars())
+    
+    now = datetime.utcnow()
+    rows = [
+        {
+            "paper_id": paper_id,
+            "file_path": f"{paper_id}.opus",
+            "file_size": file_size,
+            "voice_model": "zh-CN-XiaoxiaoNeural",
+            "generated_at": now,
+        }
+        for paper_id, file_size in file_sizes.items()
+        if paper_id not in existing
+    ]
+    if rows:
+        db.execute(insert(PaperTTS), rows)
     
     db.commit()
 
@@ -211,36 +416,55 @@ async def main():
         # 默认逻辑: 如果没传，可以根据当前业务习惯默认 T-3
         target_date = (pendulum.today() - pendulum.duration(days=3)).date()
 
-    print(f'🚀 CS候选池TTS生成 - 日期:{target_date} 偏移:{args.offset} 数量:{args.limit} 并发:{args.concurrency}')
+    await run_for_date(
+        target_date,
+        offset=args.offset,
+        limit=args.limit,
+        concurrency=args.concurrency,
+        voice=args.voice,
+        output_dir=args.output_dir,
+    )
+
+async def run_for_date(target_date, offset=0, limit=50, concurrency=6,
+                       voice="zh-CN-XiaoxiaoNeural", output_dir="/data/proj/flopap/data/tts_opus") -> bool:
+    """为指定日期生成TTS (可被外部调用)"""
+    print(f'🚀 CS候选池TTS生成 - 日期:{target_date} 偏移:{offset} 数量:{limit} 并发:{concurrency}')
     
-    output_dir = Path(args.output_dir)
+    output_dir = Path(output_dir)
     output_dir.mkdir(parents=True, exist_ok=True)
     
-    db = SessionLocal()
+    # 并发任务共享一个连接器：DNS 结果缓存复用，连接数不超过并发数
+    connector = SharedTCPConnector(limit=concurrency, ttl_dns_cache=300)
+    connector_token = _tts_connector.set(connector)
     
     try:
-        # 获取论文批次
-        papers = get_cs_papers_batch(db, args.offset, args.limit, target_date)
+        # 获取论文批次：短会话读完即归还连接，生成TTS的几分钟内不占用连接池
+        with SessionLocal() as db:
+            papers = get_cs_papers_batch(db, offset, limit, target_date)
         print(f'📝 获取论文: {len(papers)} 篇')
         
         if not papers:
             print('❌ 无论文需要处理')
-            return
+            return True
         
         # 并发生成TTS
-        results = await process_batch(papers, args.voice, output_dir, args.concurrency)
+        results = await process_batch(papers, voice, output_dir, concurrency)
         
-        # 保存数据库记录
-        save_tts_records(db, results, output_dir)
+        # 保存数据库记录 (生成结束后另开会话)
+        with SessionLocal() as db:
+            save_tts_records(db, results, output_dir)
         
         # 统计结果
         success_count = sum(1 for _, success in results if success)
         print(f'\n📊 批次完成: 成功 {success_count}/{len(papers)}')
+        return success_count == len(papers)
         
     except Exception as e:
         print(f'❌ 执行失败: {e}')
+        return False
     finally:
-        db.close()
+        _tts_connector.reset(connector_token)
+        await connector.shutdown()
 
 if __name__ == "__main__":
     asyncio.run(main())
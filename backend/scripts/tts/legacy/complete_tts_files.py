@@ -4,7 +4,7 @@
 """
 
 import asyncio
-import subprocess
+import os
 import sys
 from pathlib import Path
 from uuid import UUID
@@ -16,8 +16,8 @@ from sqlalchemy import text
 from app.db.session import SessionLocal
 
 
-def convert_wav_to_opus(wav_path: Path) -> bool:
-    """将WAV文件转换为OPUS"""
+async def convert_wav_to_opus(wav_path: Path) -> bool:
+    """将WAV文件转换为OPUS (异步子进程，不阻塞事件循环)"""
     try:
         opus_path = wav_path.with_suffix('.opus')
         
@@ -27,7 +27,14 @@ def convert_wav_to_opus(wav_path: Path) -> bool:
             "-application", "voip", "-y", str(opus_path)
         ]
         
-        subprocess.run(cmd, capture_output=True, check=True)
+        proc = await asyncio.create_subprocess_exec(
+            *cmd,
+            stdout=asyncio.subprocess.DEVNULL,
+            stderr=asyncio.subprocess.PIPE
+        )
+        _, stderr = await proc.communicate()
+        if proc.returncode != 0:
+            raise RuntimeError(f"ffmpeg 退出码 {proc.returncode}: {stderr[-2048:].decode(errors='ignore').strip()}")
         
         # 删除WAV文件
         wav_path.unlink()
@@ -75,6 +82,7 @@ async def main():
     converted_wavs = 0
     missing_segments = 0
     complete_papers = 0
+    wav_files = []
     
     # 遍历所有论文目录
     for paper_dir in tts_dir.iterdir():
@@ -84,11 +92,8 @@ async def main():
         total_papers += 1
         completeness = check_paper_completeness(paper_dir)
         
-        # 转换WAV文件
-        for wav_file in completeness['wav_files']:
-            if convert_wav_to_opus(wav_file):
-                converted_wavs += 1
-                print(f"✅ 转换: {wav_file.name}")
+        # 先收集WAV文件，遍历结束后并发转换
+        wav_files.extend(completeness['wav_files'])
         
         # 统计缺失片段
         missing_count = len(completeness['missing_segments'])
@@ -102,6 +107,21 @@ async def main():
         if total_papers % 100 == 0:
             print(f"📊 进度: {total_papers} 篇论文处理完成")
     
+    # ffmpeg 编码是 CPU 密集型，按 CPU 核数并发转换
+    if wav_files:
+        print(f"🔄 并发转换 {len(wav_files)} 个WAV文件")
+        semaphore = asyncio.Semaphore(os.cpu_count() or 4)
+        
+        async def convert(wav_file: Path) -> bool:
+            async with semaphore:
+                ok = await convert_wav_to_opus(wav_file)
+            if ok:
+                print(f"✅ 转换: {wav_file.name}")
+            return ok
+        
+        results = await asyncio.gather(*(convert(wav_file) for wav_file in wav_files))
+        converted_wavs = sum(results)
+    
     print(f"\n🎉 补全完成！")
     print(f"📊 统计:")
     print(f"  总论文数: {total_papers}")
@@ -35,16 +35,8 @@ class DistributedTTSCoordinator:
     
     def get_machine_papers(self, all_papers: List, start_offset: int = 0) -> List:
         """获取当前机器负责的论文"""
-        # 跳过start_offset，然后按机器数量分配
-        papers_after_offset = all_papers[start_offset:]
-        
-        # 每台机器处理的论文
-        machine_papers = []
-        for i, paper in enumerate(papers_after_offset):
-            if i % self.total_machines == self.machine_id:
-                machine_papers.append(paper)
-        
-        return machine_papers
+        # 跳过start_offset后按机器数量轮流分配，等价于步长切片
+        return all_papers[start_offset + self.machine_id::self.total_machines]
     
     async def run_distributed_generation(
         self,
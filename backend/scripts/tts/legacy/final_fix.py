@@ -4,12 +4,13 @@
 """
 
 import asyncio
-import subprocess
+import hashlib
 import json
-import uuid
+import os
 import random
-import re
+import tempfile
 import time
+from collections import defaultdict
 from pathlib import Path
 from typing import List, Tuple
 from uuid import UUID
@@ -21,37 +22,15 @@ sys.path.insert(0, str(backend_root))
 import edge_tts
 from sqlalchemy import text
 from app.db.session import SessionLocal
+from scripts.tts._markdown_cleaner import clean_markdown_for_tts
+from scripts.tts._opus_stream import edge_tts_audio, stream_mp3_to_opus
 
-
-def clean_markdown_for_tts(text: str) -> str:
-    """清理markdown语法"""
-    if not text:
-        return text
-    
-    if text.strip().startswith('```json'):
-        try:
-            json_match = re.search(r'```json\s*(\[.*?\])\s*```', text, re.DOTALL)
-            if json_match:
-                json_data = json.loads(json_match.group(1))
-                content_parts = []
-                for item in json_data:
-                    if isinstance(item, dict) and 'zh' in item:
-                        content_parts.append(item['zh'])
-                text = '\n\n'.join(content_parts)
-        except:
-            pass
-    
-    text = re.sub(r'```[^`]*```', '', text)
-    text = re.sub(r'`([^`]+)`', r'\1', text)
-    text = re.sub(r'\*\*([^*]+)\*\*', r'\1', text)
-    text = re.sub(r'\*([^*]+)\*', r'\1', text)
-    text = re.sub(r'#{1,6}\s*', '', text)
-    text = re.sub(r'\[([^\]]+)\]\([^)]+\)', r'\1', text)
-    text = re.sub(r'^\s*[-*+]\s+', '', text, flags=re.MULTILINE)
-    text = re.sub(r'^\s*\d+\.\s+', '', text, flags=re.MULTILINE)
-    text = re.sub(r'\n{3,}', '\n\n', text)
-    
-    return text.strip()
+# 片段文件名 -> 片段序号
+SEGMENT_FILE_INDEX = {f"segment_{i:02d}_part_{i+1}.opus": i for i in range(6)}
+# 论文目录中的分段缓存文件 (隐藏文件，segments.json 是 generate_segmented_tts.py 写的论文索引)
+SEGMENT_CACHE_NAME = ".segments_cache.json"
+# 句末标点统一为句号，用于分句
+_SENTENCE_END_TABLE = str.maketrans({'！': '。', '？': '。'})
 
 
 def segment_interpretation(content: str, target_segments: int = 6) -> List[Tuple[str, str]]:
@@ -59,9 +38,8 @@ def segment_interpretation(content: str, target_segments: int = 6) -> List[Tuple
     segments = []
     content = content.strip()
     
-    # 按句号分割
-    sentences = re.split(r'[。！？]', content)
-    sentences = [s.strip() for s in sentences if s.strip()]
+    # 按句号分割：先把 ！？ 统一替换为句号，再用 str.split 切分 (C 层实现，比正则快)
+    sentences = [s.strip() for s in content.translate(_SENTENCE_END_TABLE).split('。') if s.strip()]
     
     if len(sentences) == 0:
         # 如果没有句子，按字符分割
@@ -92,13 +70,44 @@ def segment_interpretation(content: str, target_segments: int = 6) -> List[Tuple
         for i in range(target_segments):
             segment_size = sentences_per_segment + (1 if i < remainder else 0)
             segment_sentences = sentences[start_idx:start_idx + segment_size]
-            segment_text = '。'.join(segment_sentences) + '。'
+            segment_text = ''.join(sentence + '。' for sentence in segment_sentences)
             segments.append((f'part_{i+1}', segment_text))
             start_idx += segment_size
     
     return segments[:target_segments]
 
 
+def load_or_segment(paper_dir: Path, full_content: str, target_segments: int = 6) -> List[Tuple[str, str]]:
+    """读取论文目录中的分段缓存 (内容哈希与片段数一致时有效)，否则重新分段并写入缓存"""
+    content_hash = hashlib.blake2b(full_content.encode('utf-8'), digest_size=16).hexdigest()
+    cache_key = f"{content_hash}:{target_segments}"
+    cache_path = paper_dir / SEGMENT_CACHE_NAME
+    
+    try:
+        cached = json.loads(cache_path.read_text(encoding='utf-8'))
+        if cached.get('key') == cache_key:
+            return [(seg_type, seg_text) for seg_type, seg_text in cached['segments']]
+    except (OSError, ValueError, KeyError, TypeError):
+        pass
+    
+    segments = segment_interpretation(full_content, target_segments=target_segments)
+    payload = json.dumps({'key': cache_key, 'segments': segments}, ensure_ascii=False)
+    
+    # mkstemp 在同目录原子创建临时文件，写完再 os.replace，中途崩溃不会留下半个缓存
+    tmp_path = None
+    try:
+        fd, tmp_name = tempfile.mkstemp(suffix='.tmp', prefix='.segments_cache_', dir=str(paper_dir))
+        tmp_path = Path(tmp_name)
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(payload)
+        os.replace(tmp_path, cache_path)
+    except OSError as e:
+        print(f"⚠️ 写入分段缓存失败 {cache_path}: {e}")
+    finally:
+        if tmp_path is not None:
+            tmp_path.unlink(missing_ok=True)
+    return segments
+
 async def generate_segment_tts(text: str, output_path: Path, voice: str = "zh-CN-XiaoxiaoNeural") -> bool:
     """生成单个片段的TTS音频"""
     try:
@@ -113,26 +122,13 @@ async def generate_segment_tts(text: str, output_path: Path, voice: str = "zh-CN
         
         communicate = edge_tts.Communicate(clean_text, voice)
         
-        temp_wav = output_path.parent / f"temp_{uuid.uuid4().hex[:8]}.wav"
-        await communicate.save(str(temp_wav))
-        
-        cmd = [
-            "ffmpeg", "-i", str(temp_wav),
-            "-c:a", "libopus", "-ar", "24000", "-b:a", "20k",
-            "-application", "voip", "-y", str(output_path)
-        ]
-        
-        subprocess.run(cmd, capture_output=True, check=True)
-        
-        if temp_wav.exists():
-            temp_wav.unlink()
+        # MP3 音频流直接写入 ffmpeg stdin 编码为 opus，不落临时文件
+        await stream_mp3_to_opus(edge_tts_audio(communicate), output_path)
         
         return output_path.exists() and output_path.stat().st_size > 0
         
     except Exception as e:
         print(f"    ❌ 生成失败: {e}")
-        if 'temp_wav' in locals() and temp_wav.exists():
-            temp_wav.unlink()
         return False
 
 
@@ -144,23 +140,25 @@ async def main():
     # 找出不完整的论文
     incomplete_papers = []
     
-    for paper_dir in tts_dir.iterdir():
-        if not paper_dir.is_dir():
-            continue
-        
-        try:
-            paper_id = UUID(paper_dir.name)
-        except ValueError:
-            continue
-        
-        opus_files = list(paper_dir.glob('*.opus'))
-        if len(opus_files) < 6:
-            missing_segments = []
-            for i in range(6):
-                opus_file = paper_dir / f"segment_{i:02d}_part_{i+1}.opus"
-                if not opus_file.exists():
-                    missing_segments.append(i)
+    # 一次 glob 收集各论文目录下已有的片段序号，替代逐个片段 exists 检查
+    present = defaultdict(set)
+    for opus_file in tts_dir.glob('*/*.opus'):
+        segment_idx = SEGMENT_FILE_INDEX.get(opus_file.name)
+        if segment_idx is not None:
+            present[opus_file.parent.name].add(segment_idx)
+    
+    # 没有任何 opus 的论文目录不会出现在 glob 结果中，目录列表单独取一次
+    with os.scandir(tts_dir) as entries:
+        for entry in entries:
+            if not entry.is_dir():
+                continue
             
+            try:
+                paper_id = UUID(entry.name)
+            except ValueError:
+                continue
+            
+            missing_segments = sorted(set(range(6)) - present.get(entry.name, set()))
             if missing_segments:
                 incomplete_papers.append((paper_id, missing_segments))
     
@@ -175,19 +173,20 @@ async def main():
     paper_data = {}
     
     try:
-        paper_ids = [str(pid) for pid, _ in incomplete_papers]
+        paper_ids = [pid for pid, _ in incomplete_papers]
         
+        # id 列表展开为 unnest 关系再 JOIN，规划器可按主键做哈希连接或索引探测
         query_sql = text("""
             SELECT 
                 p.id,
                 p.title,
                 COALESCE(pt.title_zh, p.title) as title_zh,
                 pi.interpretation
-            FROM papers p
+            FROM unnest(CAST(:paper_ids AS uuid[])) AS x(id)
+            JOIN papers p ON p.id = x.id
             LEFT JOIN paper_translations pt ON p.id = pt.paper_id
-            LEFT JOIN paper_interpretations pi ON p.id = pi.paper_id
-            WHERE p.id = ANY(:paper_ids)
-            AND pi.interpretation IS NOT NULL
+            JOIN paper_interpretations pi ON p.id = pi.paper_id
+            WHERE pi.interpretation IS NOT NULL
         """)
         
         result = db.execute(query_sql, {"paper_ids": paper_ids})
@@ -215,9 +214,8 @@ async def main():
         
         # 准备内容并分段
         full_content = f"论文标题：{data['title_zh']}\n英文标题：{data['title_en']}\nAI解读：{data['interpretation']}"
-        segments = segment_interpretation(full_content, target_segments=6)
-        
         paper_dir = tts_dir / str(paper_id)
+        segments = load_or_segment(paper_dir, full_content, target_segments=6)
         
         # 生成缺失片段
         for segment_idx in missing_segments:
@@ -5,6 +5,8 @@
 
 import asyncio
 import argparse
+import os
+from collections import defaultdict
 from pathlib import Path
 from uuid import UUID
 import sys
@@ -17,7 +19,12 @@ from sqlalchemy import text
 from app.db.session import SessionLocal
 
 # 导入生成函数
-from generate_batch_tts_optimized import segment_interpretation, generate_segment_tts
+from generate_batch_tts_optimized import generate_segment_tts
+# 分段结果缓存在论文目录中，与 final_fix.py 共用 (两者分段算法相同)
+from final_fix import load_or_segment
+
+# 片段文件名 -> 片段序号
+SEGMENT_FILE_INDEX = {f"segment_{i:02d}_part_{i+1}.opus": i for i in range(6)}
 
 
 async def main():
@@ -35,23 +42,25 @@ async def main():
     # 找出不完整的论文
     incomplete_papers = []
     
-    for paper_dir in tts_dir.iterdir():
-        if not paper_dir.is_dir():
-            continue
-        
-        try:
-            paper_id = UUID(paper_dir.name)
-        except ValueError:
-            continue
-        
-        opus_files = list(paper_dir.glob('*.opus'))
-        if len(opus_files) < 6:
-            missing_segments = []
-            for i in range(6):
-                opus_file = paper_dir / f"segment_{i:02d}_part_{i+1}.opus"
-                if not opus_file.exists():
-                    missing_segments.append(i)
+    # 一次 glob 收集各论文目录下已有的片段序号，替代逐个片段 exists 检查
+    present = defaultdict(set)
+    for opus_file in tts_dir.glob('*/*.opus'):
+        segment_idx = SEGMENT_FILE_INDEX.get(opus_file.name)
+        if segment_idx is not None:
+            present[opus_file.parent.name].add(segment_idx)
+    
+    # 没有任何 opus 的论文目录不会出现在 glob 结果中，目录列表单独取一次
+    with os.scandir(tts_dir) as entries:
+        for entry in entries:
+            if not entry.is_dir():
+                continue
             
+            try:
+                paper_id = UUID(entry.name)
+            except ValueError:
+                continue
+            
+            missing_segments = sorted(set(range(6)) - present.get(entry.name, set()))
             if missing_segments:
                 incomplete_papers.append((paper_id, missing_segments))
     
@@ -113,9 +122,8 @@ async def main():
         
         # 准备内容并分段
         full_content = f"论文标题：{data['title_zh']}\n英文标题：{data['title_en']}\nAI解读：{data['interpretation']}"
-        segments = segment_interpretation(full_content, target_segments=6)
-        
         paper_dir = tts_dir / str(paper_id)
+        segments = load_or_segment(paper_dir, full_content, target_segments=6)
         
         # 生成缺失片段
         for segment_idx in missing_segments:
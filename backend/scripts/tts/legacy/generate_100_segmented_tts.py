@@ -7,8 +7,6 @@
 import asyncio
 import re
 import sys
-import subprocess
-import json
 from pathlib import Path
 from typing import List, Dict, Tuple
 from uuid import UUID
@@ -20,39 +18,8 @@ sys.path.insert(0, str(backend_root))
 import edge_tts
 from sqlalchemy import text
 from app.db.session import SessionLocal
-
-
-def clean_markdown_for_tts(text: str) -> str:
-    """清理markdown语法，使其适合TTS"""
-    if not text:
-        return text
-    
-    # 处理JSON格式的内容
-    if text.strip().startswith('```json'):
-        try:
-            json_match = re.search(r'```json\s*(\[.*?\])\s*```', text, re.DOTALL)
-            if json_match:
-                json_data = json.loads(json_match.group(1))
-                content_parts = []
-                for item in json_data:
-                    if isinstance(item, dict) and 'zh' in item:
-                        content_parts.append(item['zh'])
-                text = '\n\n'.join(content_parts)
-        except:
-            pass
-    
-    # 清理markdown语法
-    text = re.sub(r'```[^`]*```', '', text)
-    text = re.sub(r'`([^`]+)`', r'\1', text)
-    text = re.sub(r'\*\*([^*]+)\*\*', r'\1', text)
-    text = re.sub(r'\*([^*]+)\*', r'\1', text)
-    text = re.sub(r'#{1,6}\s*', '', text)
-    text = re.sub(r'\[([^\]]+)\]\([^)]+\)', r'\1', text)
-    text = re.sub(r'^\s*[-*+]\s+', '', text, flags=re.MULTILINE)
-    text = re.sub(r'^\s*\d+\.\s+', '', text, flags=re.MULTILINE)
-    text = re.sub(r'\n{3,}', '\n\n', text)
-    
-    return text.strip()
+from scripts.tts._markdown_cleaner import clean_markdown_for_tts
+from scripts.tts._opus_stream import edge_tts_audio, stream_mp3_to_opus
 
 
 def segment_interpretation(content: str, target_segments: int = 6) -> List[Tuple[str, str]]:
@@ -97,22 +64,8 @@ async def generate_segment_tts(text: str, output_path: Path, voice: str = "zh-CN
         clean_text = clean_markdown_for_tts(text)
         communicate = edge_tts.Communicate(clean_text, voice)
         
-        # 先生成WAV文件
-        temp_wav = output_path.with_suffix('.wav')
-        await communicate.save(str(temp_wav))
-        
-        # 转换为OPUS 24kHz
-        cmd = [
-            "ffmpeg", "-i", str(temp_wav),
-            "-c:a", "libopus", "-ar", "24000", "-b:a", "20k",
-            "-application", "voip", "-y", str(output_path)
-        ]
-        
-        subprocess.run(cmd, capture_output=True, check=True)
-        
-        # 删除临时WAV文件
-        if temp_wav.exists():
-            temp_wav.unlink()
+        # MP3 音频流直接写入 ffmpeg stdin 编码为 opus，不落临时文件
+        await stream_mp3_to_opus(edge_tts_audio(communicate), output_path)
         
         return True
         
@@ -158,6 +111,15 @@ async def process_paper(paper_id: UUID, title_en: str, title_zh: str, interpreta
     return results
 
 
+async def process_paper_safe(paper_id: UUID, title_en: str, title_zh: str, interpretation: str, output_dir: Path, voice: str) -> Dict:
+    """单篇失败只记零结果，不让 TaskGroup 取消其它论文"""
+    try:
+        return await process_paper(paper_id, title_en, title_zh, interpretation, output_dir, voice)
+    except Exception as e:
+        print(f"❌ 处理论文 {paper_id} 失败: {e}")
+        return {'successful': 0, 'total': 0, 'size': 0}
+
+
 async def main():
     print("🎵 为100篇论文生成6分段OPUS 24kHz音频")
     
@@ -199,25 +161,25 @@ async def main():
         # 处理每篇论文 - 12个并发
         total_stats = {'processed': 0, 'successful_segments': 0, 'total_segments': 0, 'total_size': 0}
         
+        # 先拿到信号量再建任务，同时在飞的协程数不超过并发数，统计随完成增量累加
         semaphore = asyncio.Semaphore(12)
         
-        async def process_with_semaphore(paper_data):
-            async with semaphore:
-                paper_id, title_en, title_zh, interpretation = paper_data
-                try:
-                    return await process_paper(paper_id, title_en, title_zh, interpretation, output_dir, "zh-CN-XiaoxiaoNeural")
-                except Exception as e:
-                    print(f"❌ 处理论文 {paper_id} 失败: {e}")
-                    return {'successful': 0, 'total': 0, 'size': 0}
-        
-        tasks = [process_with_semaphore(paper_data) for paper_data in papers]
-        results = await asyncio.gather(*tasks)
-        
-        for result in results:
+        def on_done(task: asyncio.Task):
+            semaphore.release()
+            if task.cancelled():
+                return
+            result = task.result()
             total_stats['processed'] += 1
             total_stats['successful_segments'] += result['successful']
             total_stats['total_segments'] += result['total']
             total_stats['total_size'] += result['size']
+            print(f"📈 进度: {total_stats['processed']}/{len(papers)} 篇")
+        
+        async with asyncio.TaskGroup() as tg:
+            for paper_id, title_en, title_zh, interpretation in papers:
+                await semaphore.acquire()
+                task = tg.create_task(process_paper_safe(paper_id, title_en, title_zh, interpretation, output_dir, "zh-CN-XiaoxiaoNeural"))
+                task.add_done_callback(on_done)
         
         # 输出统计
         print(f"\n🎉 处理完成！")
@@ -5,10 +5,9 @@
 
 import asyncio
 import argparse
+import os
 import re
 import sys
-import subprocess
-import json
 from pathlib import Path
 from typing import List, Dict, Tuple
 from uuid import UUID
@@ -19,36 +18,8 @@ sys.path.insert(0, str(backend_root))
 import edge_tts
 from sqlalchemy import text
 from app.db.session import SessionLocal
-
-
-def clean_markdown_for_tts(text: str) -> str:
-    if not text:
-        return text
-    
-    if text.strip().startswith('```json'):
-        try:
-            json_match = re.search(r'```json\s*(\[.*?\])\s*```', text, re.DOTALL)
-            if json_match:
-                json_data = json.loads(json_match.group(1))
-                content_parts = []
-                for item in json_data:
-                    if isinstance(item, dict) and 'zh' in item:
-                        content_parts.append(item['zh'])
-                text = '\n\n'.join(content_parts)
-        except:
-            pass
-    
-    text = re.sub(r'```[^`]*```', '', text)
-    text = re.sub(r'`([^`]+)`', r'\1', text)
-    text = re.sub(r'\*\*([^*]+)\*\*', r'\1', text)
-    text = re.sub(r'\*([^*]+)\*', r'\1', text)
-    text = re.sub(r'#{1,6}\s*', '', text)
-    text = re.sub(r'\[([^\]]+)\]\([^)]+\)', r'\1', text)
-    text = re.sub(r'^\s*[-*+]\s+', '', text, flags=re.MULTILINE)
-    text = re.sub(r'^\s*\d+\.\s+', '', text, flags=re.MULTILINE)
-    text = re.sub(r'\n{3,}', '\n\n', text)
-    
-    return text.strip()
+from scripts.tts._markdown_cleaner import clean_markdown_for_tts
+from scripts.tts._opus_stream import edge_tts_audio, stream_mp3_to_opus
 
 
 def segment_interpretation(content: str, target_segments: int = 6) -> List[Tuple[str, str]]:
@@ -87,19 +58,8 @@ async def generate_segment_tts(text: str, output_path: Path, voice: str = "zh-CN
         clean_text = clean_markdown_for_tts(text)
         communicate = edge_tts.Communicate(clean_text, voice)
         
-        temp_wav = output_path.with_suffix('.wav')
-        await communicate.save(str(temp_wav))
-        
-        cmd = [
-            "ffmpeg", "-i", str(temp_wav),
-            "-c:a", "libopus", "-ar", "24000", "-b:a", "20k",
-            "-application", "voip", "-y", str(output_path)
-        ]
-        
-        subprocess.run(cmd, capture_output=True, check=True)
-        
-        if temp_wav.exists():
-            temp_wav.unlink()
+        # MP3 音频流直接写入 ffmpeg stdin 编码为 opus，不落临时文件
+        await stream_mp3_to_opus(edge_tts_audio(communicate), output_path)
         
         return True
         
@@ -115,15 +75,13 @@ async def process_paper(paper_id: UUID, title_en: str, title_zh: str, interpreta
     paper_dir = output_dir / str(paper_id)
     paper_dir.mkdir(exist_ok=True)
     
-    # 检查已存在的文件
-    existing_files = []
-    for i in range(6):
-        segment_file = paper_dir / f"segment_{i:02d}_part_{i+1}.opus"
-        if segment_file.exists() and segment_file.stat().st_size > 0:
-            existing_files.append(i)
+    # 检查已存在的文件 (一次 scandir 拿到文件名和大小，避免逐个 exists + stat)
+    with os.scandir(paper_dir) as it:
+        entries = {e.name: e.stat().st_size for e in it if e.is_file()}
+    existing_files = {i for i in range(6) if entries.get(f"segment_{i:02d}_part_{i+1}.opus", 0) > 0}
     
     if len(existing_files) == 6:
-        total_size = sum((paper_dir / f"segment_{i:02d}_part_{i+1}.opus").stat().st_size for i in range(6))
+        total_size = sum(entries[f"segment_{i:02d}_part_{i+1}.opus"] for i in range(6))
         print(f"  ✅ 已存在完整音频文件，跳过生成")
         return {'successful': 6, 'total': 6, 'size': total_size}
     
@@ -139,7 +97,7 @@ async def process_paper(paper_id: UUID, title_en: str, title_zh: str, interpreta
         
         # 检查文件是否已存在
         if i in existing_files:
-            file_size = segment_file.stat().st_size
+            file_size = entries[segment_file.name]
             results['size'] += file_size
             print(f"  ⏭️  片段 {i+1}/{len(segments)}: 已存在 ({file_size:,} bytes)")
             continue
@@ -159,6 +117,15 @@ async def process_paper(paper_id: UUID, title_en: str, title_zh: str, interpreta
     return results
 
 
+async def process_paper_safe(paper_id: UUID, title_en: str, title_zh: str, interpretation: str, output_dir: Path, voice: str) -> Dict:
+    """单篇失败只记零结果，不让 TaskGroup 取消其它论文"""
+    try:
+        return await process_paper(paper_id, title_en, title_zh, interpretation, output_dir, voice)
+    except Exception as e:
+        print(f"❌ 处理论文 {paper_id} 失败: {e}")
+        return {'successful': 0, 'total': 0, 'size': 0}
+
+
 async def main():
     parser = argparse.ArgumentParser(description="分批TTS生成")
     parser.add_argument("--offset", type=int, default=0, help="起始偏移")
@@ -204,25 +171,25 @@ async def main():
         
         total_stats = {'processed': 0, 'successful_segments': 0, 'total_segments': 0, 'total_size': 0}
         
+        # 先拿到信号量再建任务，同时在飞的协程数不超过并发数，统计随完成增量累加
         semaphore = asyncio.Semaphore(args.concurrency)
         
-        async def process_with_semaphore(paper_data):
-            async with semaphore:
-                paper_id, title_en, title_zh, interpretation = paper_data
-                try:
-                    return await process_paper(paper_id, title_en, title_zh, interpretation, output_dir, "zh-CN-XiaoxiaoNeural")
-                except Exception as e:
-                    print(f"❌ 处理论文 {paper_id} 失败: {e}")
-                    return {'successful': 0, 'total': 0, 'size': 0}
-        
-        tasks = [process_with_semaphore(paper_data) for paper_data in papers]
-        results = await asyncio.gather(*tasks)
-        
-        for result in results:
+        def on_done(task: asyncio.Task):
+            semaphore.release()
+            if task.cancelled():
+                return
+            result = task.result()
             total_stats['processed'] += 1
             total_stats['successful_segments'] += result['successful']
             total_stats['total_segments'] += result['total']
             total_stats['total_size'] += result['size']
+            print(f"📈 进度: {total_stats['processed']}/{len(papers)} 篇")
+        
+        async with asyncio.TaskGroup() as tg:
+            for paper_id, title_en, title_zh, interpretation in papers:
+                await semaphore.acquire()
+                task = tg.create_task(process_paper_safe(paper_id, title_en, title_zh, interpretation, output_dir, "zh-CN-XiaoxiaoNeural"))
+                task.add_done_callback(on_done)
         
         print(f"\n🎉 批次完成！")
         print(f"📊 统计:")
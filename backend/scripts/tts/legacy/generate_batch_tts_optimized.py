@@ -6,9 +6,7 @@
 
 import asyncio
 import argparse
-import subprocess
-import json
-import uuid
+import os
 import random
 import re
 from pathlib import Path
@@ -22,37 +20,8 @@ sys.path.insert(0, str(backend_root))
 import edge_tts
 from sqlalchemy import text
 from app.db.session import SessionLocal
-
-
-def clean_markdown_for_tts(text: str) -> str:
-    """清理markdown语法"""
-    if not text:
-        return text
-    
-    if text.strip().startswith('```json'):
-        try:
-            json_match = re.search(r'```json\s*(\[.*?\])\s*```', text, re.DOTALL)
-            if json_match:
-                json_data = json.loads(json_match.group(1))
-                content_parts = []
-                for item in json_data:
-                    if isinstance(item, dict) and 'zh' in item:
-                        content_parts.append(item['zh'])
-                text = '\n\n'.join(content_parts)
-        except:
-            pass
-    
-    text = re.sub(r'```[^`]*```', '', text)
-    text = re.sub(r'`([^`]+)`', r'\1', text)
-    text = re.sub(r'\*\*([^*]+)\*\*', r'\1', text)
-    text = re.sub(r'\*([^*]+)\*', r'\1', text)
-    text = re.sub(r'#{1,6}\s*', '', text)
-    text = re.sub(r'\[([^\]]+)\]\([^)]+\)', r'\1', text)
-    text = re.sub(r'^\s*[-*+]\s+', '', text, flags=re.MULTILINE)
-    text = re.sub(r'^\s*\d+\.\s+', '', text, flags=re.MULTILINE)
-    text = re.sub(r'\n{3,}', '\n\n', text)
-    
-    return text.strip()
+from scripts.tts._markdown_cleaner import clean_markdown_for_tts
+from scripts.tts._opus_stream import edge_tts_audio, stream_mp3_to_opus
 
 
 def segment_interpretation(content: str, target_segments: int = 6) -> List[Tuple[str, str]]:
@@ -113,26 +82,13 @@ async def generate_segment_tts(text: str, output_path: Path, voice: str = "zh-CN
         
         communicate = edge_tts.Communicate(clean_text, voice)
         
-        temp_wav = output_path.parent / f"temp_{uuid.uuid4().hex[:8]}.wav"
-        await communicate.save(str(temp_wav))
-        
-        cmd = [
-            "ffmpeg", "-i", str(temp_wav),
-            "-c:a", "libopus", "-ar", "24000", "-b:a", "20k",
-            "-application", "voip", "-y", str(output_path)
-        ]
-        
-        subprocess.run(cmd, capture_output=True, check=True)
-        
-        if temp_wav.exists():
-            temp_wav.unlink()
+        # MP3 音频流直接写入 ffmpeg stdin 编码为 opus，不落临时文件
+        await stream_mp3_to_opus(edge_tts_audio(communicate), output_path)
         
         return output_path.exists() and output_path.stat().st_size > 0
         
     except Exception as e:
         print(f"    ❌ 生成失败: {e}")
-        if 'temp_wav' in locals() and temp_wav.exists():
-            temp_wav.unlink()
         return False
 
 
@@ -141,12 +97,10 @@ async def process_paper(paper_id: UUID, title_en: str, title_zh: str, interpreta
     paper_dir = output_dir / str(paper_id)
     paper_dir.mkdir(exist_ok=True)
     
-    # 检查已存在的文件
-    existing_count = 0
-    for i in range(6):
-        segment_file = paper_dir / f"segment_{i:02d}_part_{i+1}.opus"
-        if segment_file.exists() and segment_file.stat().st_size > 0:
-            existing_count += 1
+    # 检查已存在的文件 (一次 scandir 拿到文件名和大小，避免逐个 exists + stat)
+    with os.scandir(paper_dir) as it:
+        entries = {e.name: e.stat().st_size for e in it if e.is_file()}
+    existing_count = sum(1 for i in range(6) if entries.get(f"segment_{i:02d}_part_{i+1}.opus", 0) > 0)
     
     if existing_count == 6:
         return {'status': 'skipped', 'generated': 0}
@@ -160,7 +114,7 @@ async def process_paper(paper_id: UUID, title_en: str, title_zh: str, interpreta
         segment_file = paper_dir / f"segment_{i:02d}_{segment_type}.opus"
         
         # 跳过已存在的文件
-        if segment_file.exists() and segment_file.stat().st_size > 0:
+        if entries.get(segment_file.name, 0) > 0:
             continue
         
         if await generate_segment_tts(segment_text, segment_file, voice):
@@ -224,23 +178,32 @@ async def main():
     total_processed = 0
     total_generated = 0
     
+    # 先拿到信号量再建任务，同时在飞的协程数不超过并发数，统计随完成增量累加
     semaphore = asyncio.Semaphore(args.concurrency)
     
-    async def process_with_semaphore(paper_data):
-        async with semaphore:
-            paper_id, title_en, title_zh, interpretation = paper_data
-            return await process_paper(paper_id, title_en, title_zh, interpretation, output_dir, args.voice)
-    
     for i in range(0, len(papers), args.batch_size):
         batch = papers[i:i + args.batch_size]
         print(f"\n🔄 处理批次 {i//args.batch_size + 1}/{(len(papers) + args.batch_size - 1)//args.batch_size}")
         print(f"📝 当前批次: {len(batch)} 篇论文")
         
-        tasks = [process_with_semaphore(paper_data) for paper_data in batch]
-        results = await asyncio.gather(*tasks)
-        
-        batch_processed = sum(1 for r in results if r['status'] == 'processed')
-        batch_generated = sum(r['generated'] for r in results)
+        batch_processed = 0
+        batch_generated = 0
+        
+        def on_done(task: asyncio.Task):
+            nonlocal batch_processed, batch_generated
+            semaphore.release()
+            if task.cancelled() or task.exception() is not None:
+                return
+            result = task.result()
+            if result['status'] == 'processed':
+                batch_processed += 1
+            batch_generated += result['generated']
+        
+        async with asyncio.TaskGroup() as tg:
+            for paper_id, title_en, title_zh, interpretation in batch:
+                await semaphore.acquire()
+                task = tg.create_task(process_paper(paper_id, title_en, title_zh, interpretation, output_dir, args.voice))
+                task.add_done_callback(on_done)
         
         total_processed += batch_processed
         total_generated += batch_generated
@@ -0,0 +1,76 @@
+"""
+单次扫描的 markdown 清理与原先逐条 re.sub 的实现对比
+"""
+import json
+import re
+import sys
+from pathlib import Path
+
+import pytest
+
+backend_root = Path(__file__).parent.parent
+sys.path.insert(0, str(backend_root))
+
+from scripts.tts._markdown_cleaner import clean_markdown_for_tts
+
+
+def clean_markdown_sequential(text: str) -> str:
+    """原先的逐条替换实现，作为对照"""
+    if not text:
+        return text
+
+    if text.strip().startswith('```json'):
+        try:
+            json_match = re.search(r'```json\s*(\[.*?\])\s*```', text, re.DOTALL)
+            if json_match:
+                json_data = json.loads(json_match.group(1))
+                content_parts = []
+                for item in json_data:
+                    if isinstance(item, dict) and 'zh' in item:
+                        content_parts.append(item['zh'])
+                text = '\n\n'.join(content_parts)
+        except:
+            pass
+
+    text = re.sub(r'```[^`]*```', '', text)
+    text = re.sub(r'`([^`]+)`', r'\1', text)
+    text = re.sub(r'\*\*([^*]+)\*\*', r'\1', text)
+    text = re.sub(r'\*([^*]+)\*', r'\1', text)
+    text = re.sub(r'#{1,6}\s*', '', text)
+    text = re.sub(r'\[([^\]]+)\]\([^)]+\)', r'\1', text)
+    text = re.sub(r'^\s*[-*+]\s+', '', text, flags=re.MULTILINE)
+    text = re.sub(r'^\s*\d+\.\s+', '', text, flags=re.MULTILINE)
+    text = re.sub(r'\n{3,}', '\n\n', text)
+
+    return text.strip()
+
+
+CASES = [
+    "### 1. 方法",
+    "## 2. 实验结果\n\n在 ImageNet 上达到 **SOTA**。",
+    "#1. 紧贴的编号标题",
+    "## - 列表式标题",
+    "  ### 缩进标题",
+    "第一段\n\n\n### 3. 结论\n全文总结",
+    "正文中的 ## 2. 不在行首",
+    "# 核心贡献\n\n本文提出了**新方法**，使用`torch`实现。\n\n- 第一点 *强调*\n- 第二点 [链接](http://x)",
+    "1. 步骤一\n2. 步骤二\n\n\n\n结束",
+    "代码：```python\nprint(1)\n```结束",
+    '```json\n[{"zh": "## 1. 标题\\n**粗体**说明"}, {"en": "skip"}]\n```',
+    "",
+]
+
+
+@pytest.mark.parametrize("text", CASES)
+def test_matches_sequential(text):
+    assert clean_markdown_for_tts(text) == clean_markdown_sequential(text)
+
+
+def test_numbered_heading_is_stripped():
+    assert clean_markdown_for_tts("### 1. 方法\n正文") == "方法\n正文"
+
+
+def test_star_bullet_with_bold():
+    # 逐条替换时斜体会把相邻两行的列表星号配成一对，这里改为按列表处理
+    text = "## 方法\n\n* **编码器**：使用 Transformer\n* **解码器**：自回归生成"
+    assert clean_markdown_for_tts(text) == "方法\n编码器：使用 Transformer\n解码器：自回归生成"